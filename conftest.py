@@ -1,6 +1,9 @@
+from typing import Any, Dict
+
+import django
 import pytest
 from django.conf import global_settings, settings
-from django.test.utils import setup_test_environment
+from django.test.utils import setup_test_environment, teardown_test_environment
 
 pytest_plugins = ["pytester", "django_utils_lib.testing.pytest_plugin"]
 
@@ -8,14 +11,18 @@ pytest_plugins = ["pytester", "django_utils_lib.testing.pytest_plugin"]
 def configure_django_settings():
     if settings.configured:
         return
+    test_db_config: Dict[str, Any] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+    # The test DB is throwaway, so skip durability work (`init_command` requires Django >= 5.1)
+    if django.VERSION >= (5, 1):
+        test_db_config["OPTIONS"] = {
+            "init_command": "PRAGMA synchronous=OFF; PRAGMA journal_mode=MEMORY; PRAGMA temp_store=MEMORY;"
+        }
     settings.configure(
         default_settings=global_settings,
-        DATABASES={
-            "default": {
-                "ENGINE": "django.db.backends.sqlite3",
-                "NAME": ":memory:",
-            }
-        },
+        DATABASES={"default": test_db_config},
         INSTALLED_APPS=[
             "django.contrib.admin",
             "django.contrib.auth",
@@ -24,6 +31,9 @@ def configure_django_settings():
             "django.contrib.messages",
             "django.contrib.staticfiles",
         ],
+        # The default (PBKDF2) hasher is intentionally slow, which adds up quickly
+        # across tests that create users
+        PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
     )
 
 
@@ -32,5 +42,15 @@ def pytest_configure():
     # do this. However, the pytest-django fixture we are disabling here is hard
     # to alter in any other way, especially as it uses session-level autouse
     pytest.MonkeyPatch().setattr("pytest_django.plugin.django_test_environment", lambda: None)
+    # Note: Settings need to be configured this early (vs in a fixture), since test modules
+    # import Django models at collection time
     configure_django_settings()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def django_test_environment():
+    # Deferred until tests actually run, so collection-only invocations skip this setup.
+    # Note: This takes the name of pytest-django's (disabled) fixture, which its DB fixtures depend on
     setup_test_environment(debug=False)
+    yield
+    teardown_test_environment()
@@ -1,5 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
 from typing_extensions import NotRequired, TypedDict
 
@@ -27,14 +32,21 @@ class EmailBasedUserManager(BaseUserManager):
 
     use_in_migrations = True
 
+    @cached_property
+    def _user_model(self):
+        # Resolved on first use (vs import / init), since the app registry might not be ready yet
+        return get_user_model()
+
     def _create_user(self, email: str, password: str, **extra_fields):
         if not email:
             raise ValueError("The given email must be set")
         email = self.normalize_email(email)
         validate_password(password)
-        user = get_user_model().objects.create(email=email, password=password, **extra_fields)
+        # Hash on the unsaved instance, so that we only run the (slow) hasher once and
+        # only hit the DB with a single INSERT
+        user = self._user_model(email=email, **extra_fields)
         user.set_password(password)
-        user.save()
+        user.save(using=self._db)
         return user
 
     def create_user(self, email: str, password: str, **extra_fields):
@@ -43,6 +55,34 @@ class EmailBasedUserManager(BaseUserManager):
         extra_fields.setdefault("is_superuser", False)
         return self._create_user(email, password, **extra_fields)
 
+    def bulk_create_users(self, entries: List[Tuple[str, str, Dict]], max_workers: Optional[int] = None):
+        """
+        Create many (regular) users at once, from a list of `(email, password, extra_fields)` entries
+
+        Password hashing is deliberately slow, so rather than hashing serially, the hashes
+        are computed in parallel (the standard hashers release the GIL while hashing), and
+        then all users are inserted with a single `bulk_create()`.
+
+        Warning: Like `bulk_create()`, this skips `save()` (and any signals / overrides attached to it)
+        """
+        prepared_entries: List[Tuple[str, str, Dict]] = []
+        for email, password, extra_fields in entries:
+            if not email:
+                raise ValueError("The given email must be set")
+            validate_password(password)
+            extra_fields = {"is_active": True, "is_staff": False, "is_superuser": False, **extra_fields}
+            prepared_entries.append((self.normalize_email(email), password, extra_fields))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            password_hashes = list(executor.map(make_password, [password for _, password, _ in prepared_entries]))
+
+        user_model = self._user_model
+        users = [
+            user_model(email=email, password=password_hash, **extra_fields)
+            for (email, _, extra_fields), password_hash in zip(prepared_entries, password_hashes)
+        ]
+        return user_model.objects.using(self._db).bulk_create(users)
+
     def create_superuser(self, email: str, password: str, **extra_fields):
         extra_fields.setdefault("is_active", True)
         extra_fields.setdefault("is_staff", True)
@@ -4,8 +4,7 @@ from typing import List
 import typer
 from rich.console import Console
 
-from django_utils_lib.commands import check_versions_in_sync
-from django_utils_lib.commands import generate_combined_spdx_sbom_json as generate_combined_spdx_sbom_json_cmd
+from django_utils_lib.commands import check_versions_in_sync, write_combined_spdx_sbom_json
 
 app = typer.Typer()
 console = Console()
@@ -18,8 +17,7 @@ def generate_combined_spdx_sbom_json(
     merged_name="Combined SBOM",
     merged_namespace="https//localhost",
 ):
-    out_json = generate_combined_spdx_sbom_json_cmd(sbom_paths, merged_name, merged_namespace)
-    out_path.write_text(out_json)
+    write_combined_spdx_sbom_json(sbom_paths, out_path, merged_name, merged_namespace)
 
 
 app.command()(check_versions_in_sync)
@@ -1,11 +1,22 @@
 import sys
 from contextlib import ContextDecorator
+from functools import lru_cache
 from typing import Any, List
 
 import rich.markup as rich_markup
 from rich.console import Console
 
 
+@lru_cache(maxsize=1024)
+def _escape_cached(markup: str) -> str:
+    # Console output tends to be very repetitive (prefixes, labels, etc.), so cache escapes
+    return rich_markup.escape(markup)
+
+
+def _escape(o: Any) -> Any:
+    return _escape_cached(o) if isinstance(o, str) else rich_markup.escape(o)
+
+
 class AlwaysEscapeMarkupConsole(Console):
     """
     Wrapper around Rich's Console to force logging to alway use markup AND escape output
@@ -21,10 +32,10 @@ class AlwaysEscapeMarkupConsole(Console):
         self._markup = True
 
     def log(self, *objects: Any, **kwargs: Any) -> None:
-        return super().log(*[rich_markup.escape(o) for o in objects], **kwargs)
+        return super().log(*[_escape(o) for o in objects], **kwargs)
 
     def print(self, *objects: Any, **kwargs: Any) -> None:
-        return super().print(*[rich_markup.escape(o) for o in objects], **kwargs)
+        return super().print(*[_escape(o) for o in objects], **kwargs)
 
 
 class MonkeyPatchedArgsWithExpandedRepeats(ContextDecorator):
@@ -53,26 +64,27 @@ class MonkeyPatchedArgsWithExpandedRepeats(ContextDecorator):
     """
 
     def __init__(self, args_to_expand: List[str]):
-        self.args_to_expand = args_to_expand
+        self.args_to_expand = frozenset(args_to_expand)
 
     def __enter__(self):
-        self.original_args = sys.argv.copy()
-        args = sys.argv.copy()
-        patched_arg_list = []
-
-        idx = 0
-        while idx < len(args):
-            arg = args[idx]
-            if arg in self.args_to_expand:
-                # Capture everything from current position, until next flag/opt or end of args,
-                # and repeat the arg_id before each
-                while idx + 1 < len(args) and not args[idx + 1].startswith("-"):
-                    patched_arg_list.extend([arg, args[idx + 1]])
-                    idx += 1
-                idx += 1
+        # `sys.argv` gets re-assigned (not mutated), so we can hold onto the original list as-is
+        self.original_args = sys.argv
+        args_to_expand = self.args_to_expand
+        patched_arg_list: List[str] = []
+        append = patched_arg_list.append
+
+        # Single pass: while inside an expanded arg's values (everything until the next flag/opt
+        # or the end of args), repeat the arg_id before each value
+        current_expanded_arg = None
+        for arg in sys.argv:
+            if current_expanded_arg is not None and not arg.startswith("-"):
+                append(current_expanded_arg)
+                append(arg)
+            elif arg in args_to_expand:
+                current_expanded_arg = arg
             else:
-                patched_arg_list.append(arg)
-                idx += 1
+                current_expanded_arg = None
+                append(arg)
         sys.argv = patched_arg_list
 
     def __exit__(self, *exc):
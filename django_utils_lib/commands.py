@@ -1,8 +1,46 @@
 import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
-from typing import Dict, Final, List, Optional, Union
+from typing import Any, Dict, Final, List, Optional, Tuple, Union
+
+from django_utils_lib.json_utils import json_loads
+
+if sys.version_info >= (3, 11):
+    import tomllib
+
+
+def _load_json_file(path: Union[str, Path]) -> Dict:
+    # Read as bytes, so we can skip an intermediate decoded copy of (potentially huge) documents
+    with open(path, "rb") as file:
+        return json_loads(file.read())
+
+
+def _combine_spdx_sboms(sbom_paths: List[str], merged_name: str, merged_namespace: str) -> Dict:
+    combined_sbom_json = _load_json_file(sbom_paths[0])
+    expected_spdx_version = combined_sbom_json["spdxVersion"]
+    combined_sbom_json["name"] = merged_name
+    combined_sbom_json["documentNamespace"] = merged_namespace
+
+    remaining_sbom_paths = sbom_paths[1:]
+    if not remaining_sbom_paths:
+        return combined_sbom_json
+
+    # Overlap disk reads with parsing, across files (`map()` still yields in submission order)
+    with ThreadPoolExecutor(max_workers=min(8, len(remaining_sbom_paths))) as executor:
+        all_sbom_jsons = [combined_sbom_json]
+        for sbom_json in executor.map(_load_json_file, remaining_sbom_paths):
+            # Don't allow combining outputs with different versions
+            assert sbom_json["spdxVersion"] == expected_spdx_version
+            all_sbom_jsons.append(sbom_json)
+
+    # Build each combined list in a single pass, rather than growing it file-by-file
+    for sbom_key in ["files", "packages", "relationships"]:
+        combined_sbom_json[sbom_key] = list(chain.from_iterable(sbom_json[sbom_key] for sbom_json in all_sbom_jsons))
+
+    return combined_sbom_json
 
 
 def generate_combined_spdx_sbom_json(
@@ -16,25 +54,46 @@ def generate_combined_spdx_sbom_json(
     Warning: This is a basic implementation that makes some assumptions about the
     validity of the input files and what sort of output is desired.
     """
-    with open(sbom_paths[0], "r") as file:
-        combined_sbom_json: Dict = json.load(file)
-        expected_spdx_version = combined_sbom_json["spdxVersion"]
-    combined_sbom_json["name"] = merged_name
-    combined_sbom_json["documentNamespace"] = merged_namespace
+    return json.dumps(_combine_spdx_sboms(sbom_paths, merged_name, merged_namespace), indent=2)
 
-    for sbom_path in sbom_paths:
-        sbom_json = json.loads(Path(sbom_path).read_text())
-        # Don't allow combining outputs with different versions
-        assert sbom_json["spdxVersion"] == expected_spdx_version
-        for sbom_key in ["files", "packages", "relationships"]:
-            combined_sbom_json[sbom_key] += sbom_json[sbom_key]
 
-    return json.dumps(combined_sbom_json, indent=2)
+def write_combined_spdx_sbom_json(
+    sbom_paths: List[str],
+    out_path: Union[str, Path],
+    merged_name="Combined SBOM",
+    merged_namespace="https//localhost",
+) -> None:
+    """
+    Same as `generate_combined_spdx_sbom_json`, but streams the combined output
+    directly to `out_path`, rather than building the entire JSON string in memory
+    """
+    combined_sbom_json = _combine_spdx_sboms(sbom_paths, merged_name, merged_namespace)
+    with open(out_path, "w") as file:
+        json.dump(combined_sbom_json, file, indent=2)
 
 
 # Note: Capitalization does not matter, as these will be checked as case-insensitive
 UNDERSTOOD_VERSION_CONTAINERS: Final = ["pyproject.toml", "package.json", "cargo.toml"]
 
+# Key paths (checked in order) to the version string, for TOML based version containers
+_TOML_VERSION_LOOKUP_KEYS: Final[Dict[str, List[Tuple[str, ...]]]] = {
+    "pyproject.toml": [("tool", "poetry", "version"), ("project", "version")],
+    "cargo.toml": [("package", "version")],
+}
+
+_MISSING: Final = object()
+
+
+def _dig(data: Dict, keys: Tuple[str, ...]) -> Any:
+    """
+    Walks nested dicts via `keys`, returning `_MISSING` (vs raising) if any key is absent
+    """
+    for key in keys:
+        data = data.get(key, _MISSING)
+        if data is _MISSING:
+            return _MISSING
+    return data
+
 
 def check_versions_in_sync(version_declaration_files: List[str], expected_version: Optional[str] = None):
     """
@@ -56,26 +115,15 @@ def check_versions_in_sync(version_declaration_files: List[str], expected_versio
                 package_json = json.loads(file_contents)
                 extracted_version = package_json["version"]
 
-            elif filename == "pyproject.toml" or filename == "cargo.toml":
+            elif filename in _TOML_VERSION_LOOKUP_KEYS:
                 if not sys.version_info >= (3, 11):
                     raise NotImplementedError("The TOML parser is only included with Python >= 3.11")
-                import tomllib
-
-                lookup_accessors = (
-                    ["tool.poetry.version", "project.version"] if filename == "pyproject.toml" else ["package.version"]
-                )
 
                 project_toml = tomllib.loads(file_contents)
-                for lookup_accessor in lookup_accessors:
-                    if extracted_version is not None:
-                        continue
-                    try:
-                        project_info = project_toml
-                        for key in lookup_accessor.split("."):
-                            project_info = project_info[key]
+                for lookup_keys in _TOML_VERSION_LOOKUP_KEYS[filename]:
+                    if (project_info := _dig(project_toml, lookup_keys)) is not _MISSING:
                         extracted_version = project_info
-                    except KeyError:
-                        pass
+                        break
 
             assert isinstance(extracted_version, str), f"Could not find version info in {filepath}"
         if not expected_version:
@@ -0,0 +1,28 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+def json_dumps(obj: Any) -> bytes:
+    """
+    Serializes `obj` to (compact) UTF-8 JSON bytes, using `orjson` if it is installed
+    (which is much faster), and falling back to the standard library if not
+    """
+    if orjson is not None:
+        # Match stdlib behavior, which stringifies non-`str` keys (e.g. ints)
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """
+    Parses JSON from `bytes` or `str`, using `orjson` if it is installed, and falling back
+    to the standard library if not
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
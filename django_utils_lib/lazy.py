@@ -1,4 +1,4 @@
-from typing import Callable, Optional
+from functools import cached_property
 
 
 class LazyDjango:
@@ -12,15 +12,11 @@ class LazyDjango:
     to just use lazy-imports.
     """
 
-    _redirect_to_login: Optional[Callable] = None
-
-    @property
+    @cached_property
     def redirect_to_login(self):
-        if self._redirect_to_login is None:
-            from django.contrib.auth.views import redirect_to_login
+        from django.contrib.auth.views import redirect_to_login
 
-            self._redirect_to_login = redirect_to_login
-        return self._redirect_to_login
+        return redirect_to_login
 
 
 lazy_django = LazyDjango()
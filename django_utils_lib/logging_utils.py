@@ -16,13 +16,13 @@ def build_heading_block(heading: Union[str, List[str]], border_width=2) -> str:
     heading_lines = [heading_delim]
 
     # Leave space for border, plus one space on each side
+    # Note: Clamped, since a negative width is invalid in a format spec (e.g. on narrow terminals)
     border = "=" * border_width
-    border_width_total = border_width + 1
+    inner_width = max(terminal_width - (border_width + 1) * 2, 0)
 
     for line in heading if isinstance(heading, list) else heading.splitlines():
-        left_inner_padding = int((terminal_width - len(line) - (border_width_total * 2)) / 2)
-        right_inner_padding = int(terminal_width - left_inner_padding - len(line) - (border_width_total * 2))
-        heading_lines.append(f"{border} {' ' * left_inner_padding}{line}{' ' * right_inner_padding} {border}")
+        # Note: Unlike `str.center`, `^` always puts the odd leftover space on the right
+        heading_lines.append(f"{border} {line:^{inner_width}} {border}")
     heading_lines.append(heading_delim)
 
     return "\n".join(heading_lines)
@@ -1,6 +1,5 @@
-from abc import ABC, abstractmethod
-from typing import Callable, Final
-from urllib.parse import urlparse
+import re
+from typing import Callable, Final, List
 
 from django.conf import settings
 from django.http import HttpRequest, HttpResponse
@@ -9,14 +8,20 @@ from django_utils_lib.logger import pkg_logger
 
 GetResponseCallable = Callable[[HttpRequest], HttpResponse]
 
+# Matches the `protocol://hostname:port` (origin) section at the start of a URL, if present
+_URL_ORIGIN_PATTERN: Final = re.compile(r"^(?:[a-zA-Z][a-zA-Z0-9+.-]*:)?//[^/?#]*")
+
+
+class BaseMiddleware:
+    """
+    Minimal base for (sync) Django middleware; subclasses must implement `__call__`
+    """
 
-class BaseMiddleware(ABC):
     def __init__(self, get_response: GetResponseCallable):
         self.get_response = get_response
 
-    @abstractmethod
     def __call__(self, request: HttpRequest) -> HttpResponse:
-        return NotImplemented
+        raise NotImplementedError
 
 
 class DANGEROUS_DisableCSRFMiddleware(BaseMiddleware):
@@ -46,11 +51,13 @@ class DevServerRedirectMiddleware(BaseMiddleware):
     dev server after hitting the backend.
 
     Use `DEV_SERVER_ACCEPTED_DEV_SERVER_PORTS` to control, with List[Union[int, str]]
+    (read once, when the middleware is instantiated)
     """
 
     DJANGO_SETTINGS_KEY: Final = "DEV_SERVER_ACCEPTED_DEV_SERVER_PORTS"
 
-    def __call__(self, request: HttpRequest) -> HttpResponse:
+    def __init__(self, get_response: GetResponseCallable):
+        super().__init__(get_response)
         settings_key = DevServerRedirectMiddleware.DJANGO_SETTINGS_KEY
         accepted_dev_ports_setting = getattr(settings, settings_key, [])
         if not isinstance(accepted_dev_ports_setting, list):
@@ -63,29 +70,50 @@ class DevServerRedirectMiddleware(BaseMiddleware):
             "PROD" not in getattr(settings, "RUNTIME_ENV", "").upper()
         ), "You should not use the dev server redirect middleware in a production environment"
 
+        # Settings are static for the lifetime of the middleware, so resolve the
+        # port matchers once, rather than on every request
+        accepted_port_strings: List[str] = []
+        for port in accepted_dev_ports_setting:
+            if not isinstance(port, (str, int)):
+                pkg_logger.warning(f"Invalid port value: {port}")
+                continue
+            accepted_port_strings.append(f":{port}")
+        self._accepted_port_strings = tuple(accepted_port_strings)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not self._accepted_port_strings:
+            return self.get_response(request)
+
         referer = request.headers.get("referer", "")
         response = self.get_response(request)
 
         if not (300 <= response.status_code < 400):
             return response
 
-        for port in accepted_dev_ports_setting:
-            if not isinstance(port, (str, int)):
-                pkg_logger.warning(f"Invalid port value: {port}")
-                continue
-            if f":{port}" in referer:
-                referrer_url = urlparse(referer)
-                original_redirect_url = urlparse(response["Location"])
-
-                # Swap out just the protocol://hostname:port section
-                redirect_url = original_redirect_url._replace(scheme=referrer_url.scheme, netloc=referrer_url.netloc)
+        for port_string in self._accepted_port_strings:
+            if port_string in referer:
+                referrer_origin_match = _URL_ORIGIN_PATTERN.match(referer)
+                if referrer_origin_match is None:
+                    break
+                original_redirect_url = response["Location"]
+
+                # Swap out just the protocol://hostname:port section (or add it, for relative redirects)
+                redirect_origin_match = _URL_ORIGIN_PATTERN.match(original_redirect_url)
+                redirect_url_tail = (
+                    original_redirect_url[redirect_origin_match.end() :]
+                    if redirect_origin_match
+                    else original_redirect_url
+                )
+                if redirect_url_tail and redirect_url_tail[0] not in "/?#":
+                    redirect_url_tail = f"/{redirect_url_tail}"
+                redirect_url = referrer_origin_match.group(0) + redirect_url_tail
 
                 pkg_logger.info(
-                    f"DevServerRedirectMiddleware: Modified redirect from {original_redirect_url.geturl()} to "
-                    f"{redirect_url.geturl()}"
+                    f"DevServerRedirectMiddleware: Modified redirect from {original_redirect_url} to {redirect_url}"
                 )
 
-                response["Location"] = redirect_url.geturl()
+                response["Location"] = redirect_url
+                break
 
         return response
 
@@ -1,24 +1,179 @@
-import json
 import os
 import re
-import tempfile
-from typing import Dict, Final, List, Literal, Optional, TypedDict, Union
+import threading
+from enum import Enum, auto
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Final,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+    Union,
+    cast,
+)
 
 import pydantic
 from django.conf import settings
 from django.http import (
     FileResponse,
+    Http404,
     HttpRequest,
     HttpResponse,
     HttpResponseForbidden,
     HttpResponseNotAllowed,
     HttpResponseNotFound,
 )
-from django.urls import re_path
+from django.urls import URLPattern, re_path
 from django.views.static import serve
 from typing_extensions import NotRequired
 
+from django_utils_lib.json_utils import json_dumps
 from django_utils_lib.lazy import lazy_django
+from django_utils_lib.logger import pkg_logger
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None  # type: ignore[assignment]
+
+# Regex flags that can be scoped to a single sub-pattern, via an inline flag group (e.g. `(?i:...)`)
+_SCOPABLE_REGEX_FLAGS: Final = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x", re.ASCII: "a"}
+
+# Sub-pattern features that would change meaning (or fail to compile) if combined with other patterns:
+# numbered / named backreferences, numbered conditional groups, and global inline flags
+_UNFUSABLE_PATTERN_SYNTAX: Final = re.compile(r"\\[1-9]|\(\?P=|\(\?\(\d|\(\?[aiLmsux]+\)")
+
+# HTTP methods that `SimpleStaticFileServer` will respond to
+_ALLOWED_STATIC_HTTP_METHODS: Final = ("GET", "HEAD", "OPTIONS")
+# Routes for `SimpleStaticFileServer.generate_url_patterns`. They don't depend on the ignored
+# prefixes (those are checked in the views), so they are shared by every generated pattern.
+# Captures paths with extensions, and passes them through as-is
+_STATIC_ASSET_ROUTE: Final = r"^(?P<asset_path>[^?#]*\.[^/?#]+)$"
+# Captures extension-less paths, to try to map them to an `index.html`
+_STATIC_INDEX_ROUTE: Final = r"^(?P<asset_path>[^?#]+).*$"
+
+
+# Regex flags with a Hyperscan equivalent. Case-insensitivity is deliberately excluded, since
+# Hyperscan's case folding differs from Python's (e.g. for "İ" or the Kelvin sign)
+_HYPERSCAN_FLAG_EQUIVALENTS: Final = (
+    {re.MULTILINE: hyperscan.HS_FLAG_MULTILINE, re.DOTALL: hyperscan.HS_FLAG_DOTALL} if hyperscan is not None else {}
+)
+# Flags that don't affect the meaning of patterns restricted to `_HYPERSCAN_COMPATIBLE_PATTERN_SYNTAX`
+_HYPERSCAN_NEUTRAL_FLAGS: Final = re.UNICODE | re.ASCII
+
+# The (vetted) subset of pattern syntax that Hyperscan interprets the same way as Python. Anything
+# else, such as `{,n}` quantifiers (a literal in PCRE), shorthand classes like `\s` / `\w` (whose
+# Unicode coverage differs), anchors like `\Z`, lookarounds, or backreferences, is left to `re`
+_HYPERSCAN_COMPATIBLE_PATTERN_SYNTAX: Final = re.compile(
+    r"""(?:
+        [^\\\[\](){}?*+|^$.]                                    # Literal characters
+        | \\[^A-Za-z0-9]                                        # Escaped punctuation
+        | \[\^?(?:[^\\\[\]]|\\[^A-Za-z0-9])+\]                  # Character sets, of the above
+        | \((?!\?) | \(\?: | \(\?P<[A-Za-z_][A-Za-z0-9_]*>      # Plain, non-capturing, and named groups
+        | [)|^$.*+?]                                            # Anchors, alternation, and simple quantifiers
+        | \{[0-9]+(?:,[0-9]*)?\}                                # Bounded quantifiers, with an explicit minimum
+    )*""",
+    re.VERBOSE,
+)
+
+
+def _build_hyperscan_path_matcher(patterns: Sequence[re.Pattern]) -> Optional[Callable[[str], bool]]:
+    """
+    Builds a matcher (see `_build_path_matcher`) that checks all the patterns in a single
+    (DFA-based, linear time) Hyperscan scan, or returns `None` if the patterns can't be
+    handled by Hyperscan, in which case the `re`-based matcher should be used instead
+    """
+    base_flags = hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_ALLOWEMPTY | hyperscan.HS_FLAG_UTF8
+    expressions: List[bytes] = []
+    expression_flags: List[int] = []
+    for pattern in patterns:
+        if (
+            not isinstance(pattern.pattern, str)
+            or pattern.flags & ~(_HYPERSCAN_NEUTRAL_FLAGS | re.MULTILINE | re.DOTALL)
+            or not _HYPERSCAN_COMPATIBLE_PATTERN_SYNTAX.fullmatch(pattern.pattern)
+        ):
+            return None
+        flags = base_flags
+        for flag, hyperscan_flag in _HYPERSCAN_FLAG_EQUIVALENTS.items():
+            if pattern.flags & flag:
+                flags |= hyperscan_flag
+        expressions.append(pattern.pattern.encode())
+        expression_flags.append(flags)
+
+    database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    try:
+        database.compile(
+            expressions=expressions,
+            ids=list(range(len(expressions))),
+            elements=len(expressions),
+            flags=expression_flags,
+        )
+    except hyperscan.error:
+        # E.g. possessive quantifiers, which Hyperscan does not support
+        return None
+
+    # Scratch space can't be shared across concurrent scans, so each thread gets its own
+    thread_local = threading.local()
+
+    def on_match(expression_id: int, start: int, end: int, flags: int, matches: object) -> None:
+        cast(List[int], matches).append(expression_id)
+
+    def matcher(path: str) -> bool:
+        scratch = getattr(thread_local, "scratch", None)
+        if scratch is None:
+            scratch = thread_local.scratch = hyperscan.Scratch(database)
+        matches: List[int] = []
+        database.scan(path.encode(), match_event_handler=on_match, context=matches, scratch=scratch)
+        return bool(matches)
+
+    return matcher
+
+
+def _build_path_matcher(patterns: Sequence[re.Pattern]) -> Optional[Callable[[str], object]]:
+    """
+    Builds a single callable that returns a truthy value if any of the given patterns
+    match (via `search`) the given path, or `None` if there are no patterns at all.
+
+    Where possible, the patterns are fused into a single alternation pattern, so that checking
+    all of them is a single regex call, rather than one (Python-level) call per pattern. If
+    `hyperscan` is installed, it is used instead (for multiple patterns), when it supports them.
+    """
+    if not patterns:
+        return None
+    if len(patterns) == 1:
+        return patterns[0].search
+    if hyperscan is not None and (hyperscan_matcher := _build_hyperscan_path_matcher(patterns)) is not None:
+        return hyperscan_matcher
+    sub_patterns: List[str] = []
+    for pattern in patterns:
+        if _UNFUSABLE_PATTERN_SYNTAX.search(pattern.pattern):
+            return lambda path: any(pattern.search(path) for pattern in patterns)
+        scoped_flags = "".join(char for flag, char in _SCOPABLE_REGEX_FLAGS.items() if pattern.flags & flag)
+        # Note: Verbose patterns could end in a comment, which would swallow the closing paren
+        sub_pattern_end = "\n)" if pattern.flags & re.VERBOSE else ")"
+        sub_patterns.append(f"(?{scoped_flags}:{pattern.pattern}{sub_pattern_end}")
+    try:
+        return re.compile("|".join(sub_patterns)).search
+    except re.error:
+        return lambda path: any(pattern.search(path) for pattern in patterns)
+
+
+class _PathAccess(Enum):
+    """
+    The outcome of checking a URL path against the `SimpleStaticFileServer` access rules
+    """
+
+    ALLOWED = auto()
+    NOT_FOUND = auto()
+    FORBIDDEN = auto()
+    AUTH_REQUIRED = auto()
 
 
 class SimpleStaticFileServerConfig(pydantic.BaseModel):
@@ -78,6 +233,27 @@ class SimpleStaticFileServer:
                 self.config = SimpleStaticFileServerConfig()
             else:
                 raise ValueError(f"Invalid config for SimpleStaticFileServer: {err}")
+        # Hoist config values used on every request into plain attributes, to avoid the
+        # overhead of pydantic attribute access (and `or []` fallbacks) in the hot path.
+        # Note: This means that the config should be treated as read-only after init
+        self._block_bare_html_access = self.config.block_bare_html_access
+        self._forbidden_path_matcher = _build_path_matcher(self.config.forbidden_path_patterns or [])
+        self._auth_required_path_matcher = _build_path_matcher(self.config.auth_required_path_patterns or [])
+        self._json_context_key = self.config.json_context_key
+        self._json_context_injection_location = self.config.json_context_injection_location
+        # The start of the injected script tag only varies by config (unless overridden per-request)
+        self._json_script_tag_prefix = f"<script>window.{self._json_context_key} = ".encode()
+        # If there are no rules at all, `guard_path` can skip all checks (and the classification cache)
+        self._has_path_rules = bool(
+            self._block_bare_html_access or self._forbidden_path_matcher or self._auth_required_path_matcher
+        )
+        # Access rules only depend on the path, so classifications are cached (per-server)
+        self._classify_path = lru_cache(maxsize=4096)(self._classify_path_uncached)
+        # Cache of HTML files that have had JSON injected into them, keyed by (path, injection location),
+        # with values of (mtime, HTML before injection point, HTML after injection point)
+        self._html_injection_cache: Dict[Tuple[str, str], Tuple[int, bytes, Optional[bytes]]] = {}
+        # Generated URL patterns, keyed by the tuple of ignored path prefixes
+        self._url_patterns_cache: Dict[Tuple[str, ...], List[URLPattern]] = {}
 
     def guard_path(self, request: HttpRequest, url_path: str) -> Optional[HttpResponse]:
         """
@@ -87,19 +263,43 @@ class SimpleStaticFileServer:
         Returns `None` if the processing chain should be continued as-is, or returns
         a `HttpResponse` if the chain should end and the response immediately sent back
         """
-        # Check for bare access first, since this should be the fastest check
-        if self.config.block_bare_html_access and url_path.endswith(".html"):
+        if not self._has_path_rules:
+            return None
+        path_access = self._classify_path(url_path)
+        if path_access is _PathAccess.ALLOWED:
+            return None
+        if path_access is _PathAccess.NOT_FOUND:
             return HttpResponseNotFound()
-        # Check explicit block list
-        if any(pattern.search(url_path) for pattern in self.config.forbidden_path_patterns or []):
+        if path_access is _PathAccess.FORBIDDEN:
             return HttpResponseForbidden()
-        # Check for attempted access to an auth-required path from a non-authed user
-        if self.config.auth_required_path_patterns and not request.user.is_authenticated:
-            if any(pattern.search(url_path) for pattern in self.config.auth_required_path_patterns):
-                return lazy_django.redirect_to_login(next=request.get_full_path())
+        # Auth-required paths only need to be interrupted for non-authed users
+        if request.user.is_authenticated:
+            return None
+        return lazy_django.redirect_to_login(next=request.get_full_path())
 
-        # Pass request forward / noop
-        return None
+    def _classify_path_uncached(self, url_path: str) -> _PathAccess:
+        """
+        Classifies a URL path by the (request-independent) access rules that apply to it
+        """
+        # Check for bare access first, since this should be the fastest check
+        if self._block_bare_html_access and url_path.endswith(".html"):
+            return _PathAccess.NOT_FOUND
+        # Check explicit block list
+        if self._forbidden_path_matcher is not None and self._forbidden_path_matcher(url_path):
+            return _PathAccess.FORBIDDEN
+        if self._auth_required_path_matcher is not None and self._auth_required_path_matcher(url_path):
+            return _PathAccess.AUTH_REQUIRED
+        return _PathAccess.ALLOWED
+
+    def clear_caches(self) -> None:
+        """
+        Clears the per-server caches (path access classifications, and HTML prepared for JSON injection)
+
+        Useful for freeing memory, or if the HTML files being served change in a way that isn't
+        reflected in their mtime
+        """
+        self._classify_path.cache_clear()
+        self._html_injection_cache.clear()
 
     class JSONContext(TypedDict):
         data: Dict
@@ -142,11 +342,11 @@ class SimpleStaticFileServer:
         Additionally, it supports dynamically injecting context into an HTML response,
         by injecting the context as a JSON payload inside an injected script tag.
 
-        > **Warning**: This dynamic script injection has performance implications and could
-        probably be optimized a bit.
+        > **Note**: To keep this dynamic script injection cheap, the source HTML is cached in-memory
+        (and re-read if its mtime changes), and the response is built directly from memory.
         """
-        if request.method not in ["GET", "HEAD", "OPTIONS"]:
-            return HttpResponseNotAllowed(["GET", "HEAD", "OPTIONS"])
+        if request.method not in _ALLOWED_STATIC_HTTP_METHODS:
+            return HttpResponseNotAllowed(_ALLOWED_STATIC_HTTP_METHODS)
         url_path = url_path or request.path
         if (response := self.guard_path(request, url_path)) is not None:
             return response
@@ -157,43 +357,88 @@ class SimpleStaticFileServer:
             raise ValueError("Cannot inject JSON context into a non-HTML asset")
 
         # To render json data context into the page, we will inject is a script tag, with ...
-        global_json_key = json_data.get("global_key", self.config.json_context_key)
+        global_json_key = json_data.get("global_key", self._json_context_key)
         assert global_json_key is not None
-        injectable_json_script_tag_str = f"<script>window.{global_json_key} = {json.dumps(json_data['data'])};</script>"
-
-        injection_location = json_data.get("injection_location", self.config.json_context_injection_location)
+        script_tag_prefix = (
+            self._json_script_tag_prefix
+            if global_json_key == self._json_context_key
+            else f"<script>window.{global_json_key} = ".encode()
+        )
+        injectable_json_script_tag = script_tag_prefix + json_dumps(json_data["data"]) + b";</script>"
+
+        injection_location = json_data.get("injection_location", self._json_context_injection_location)
         assert injection_location in ["head", "body"]
 
         raw_html_path = os.path.join(settings.STATIC_ROOT or "", asset_path.lstrip("/"))
-        raw_html_code = open(raw_html_path, "r").read()
+        html_before_injection, html_after_injection = self._get_html_injection_parts(raw_html_path, injection_location)
+        if html_after_injection is None:
+            # No injection point found in the page, so serve it as-is
+            body = html_before_injection
+        else:
+            body = html_before_injection + injectable_json_script_tag + html_after_injection
+        response = HttpResponse(body, content_type="text/html; charset=utf-8")
+        # The body is fully in-memory, so the length is known upfront
+        response["Content-Length"] = str(len(body))
+        return response
+
+    def _get_html_injection_parts(self, raw_html_path: str, injection_location: str) -> Tuple[bytes, Optional[bytes]]:
+        """
+        Returns the (raw, undecoded) HTML file contents, split around the point where injected content
+        should go (or the whole file + `None`, if the injection point could not be found)
+
+        Results are cached in-memory, and invalidated if the file's mtime changes
+        """
+        mtime = os.stat(raw_html_path).st_mtime_ns
+        cache_key = (raw_html_path, injection_location)
+        cached_entry = self._html_injection_cache.get(cache_key)
+        if cached_entry is not None and cached_entry[0] == mtime:
+            return cached_entry[1], cached_entry[2]
+
+        pkg_logger.debug("Loading %s into the HTML injection cache", raw_html_path)
+        with open(raw_html_path, "rb") as file:
+            raw_html_code = file.read()
+        parts: Tuple[bytes, Optional[bytes]]
         if injection_location == "head":
-            final_html_code = raw_html_code.replace("<head>", f"<head>{injectable_json_script_tag_str}")
+            before, found_tag, after = raw_html_code.partition(b"<head>")
+            parts = (before + found_tag, after) if found_tag else (raw_html_code, None)
         else:
-            final_html_code = raw_html_code.replace("</body>", f"{injectable_json_script_tag_str}</body>")
-            # safe_join
-        with tempfile.NamedTemporaryFile("w", delete=False, suffix=".html") as temp_file:
-            temp_file.write(final_html_code)
-            temp_file_path = temp_file.name
-            print(temp_file_path)
-            return serve(request, document_root="/", path=temp_file_path.lstrip("/"))
+            before, found_tag, after = raw_html_code.rpartition(b"</body>")
+            parts = (before, found_tag + after) if found_tag else (raw_html_code, None)
+        self._html_injection_cache[cache_key] = (mtime, *parts)
+        return parts
 
-    def generate_url_patterns(self, ignore_start_strings: Optional[List[str]] = None):
+    def generate_url_patterns(self, ignore_start_strings: Optional[List[str]] = None) -> List[URLPattern]:
         """
         Generates some pattern matchers you can stick in `urlpatterns` (albeit greedy). Should go last.
+
+        Requests whose path starts with any of `ignore_start_strings` are answered with a 404.
+
+        The patterns are memoized per set of `ignore_start_strings`, so repeated calls (e.g. URLconf
+        reloads) reuse the same pattern objects.
         """
-        ignore_start_strings = ignore_start_strings or ["/static/", "/media/"]
-        negate_start_pattern = "".join([f"(?!{s})" for s in ignore_start_strings])
-        return [
-            # Capture paths with extensions, and pass through as-is
-            re_path(rf"^{negate_start_pattern}(?P<asset_path>.*\..*)$", self.serve_static_path),
-            # For extension-less paths, try to map to an `index.html`
-            re_path(
-                r"^(?P<asset_path>[^?#]+).*$",
-                lambda request, asset_path: self.serve_static_path(
-                    request, f"{asset_path.removesuffix('/')}/index.html"
-                ),
-            ),
+        # Checked with a (C-level) multi-prefix `startswith`, rather than with negative
+        # lookaheads baked into the route patterns. Note: This checks `path_info` (what URL
+        # patterns are resolved against), so that a `SCRIPT_NAME` mount prefix doesn't interfere
+        ignore_start_tuple = tuple(ignore_start_strings or ["/static/", "/media/"])
+        if (cached_patterns := self._url_patterns_cache.get(ignore_start_tuple)) is not None:
+            # Copied, so that callers extending the returned list can't affect the cache
+            return list(cached_patterns)
+
+        def serve_asset(request: HttpRequest, asset_path: str):
+            if request.path_info.startswith(ignore_start_tuple):
+                raise Http404()
+            return self.serve_static_path(request, asset_path)
+
+        def serve_index(request: HttpRequest, asset_path: str):
+            if request.path_info.startswith(ignore_start_tuple):
+                raise Http404()
+            return self.serve_static_path(request, f"{asset_path.removesuffix('/')}/index.html")
+
+        url_patterns = self._url_patterns_cache[ignore_start_tuple] = [
+            re_path(_STATIC_ASSET_ROUTE, serve_asset),
+            re_path(_STATIC_INDEX_ROUTE, serve_index),
         ]
+        return list(url_patterns)
 
 
 def object_to_multipart_dict(obj: Dict, existing_multipart_dict: Optional[dict] = None, key_prefix="") -> Dict:
@@ -217,20 +462,30 @@ def object_to_multipart_dict(obj: Dict, existing_multipart_dict: Optional[dict]
     # > {'a': 1, 'multi[0][id]': 'abc', 'multi[1][id]': '123'}
     ```
     """
+    # Fast-path: flat dicts (the most common case) don't need any key bracketing / hoisting
+    if existing_multipart_dict is None and not any(isinstance(val, (dict, list, tuple)) for val in obj.values()):
+        return {f"{key_prefix}{key}": val for key, val in obj.items()}
+
     result = existing_multipart_dict or {}
-    for _key, val in obj.items():
-        # If this is a nested child, we need to wrap key in brackets
-        _key = f"[{_key}]" if existing_multipart_dict else _key
-        key = key_prefix + _key
-        if isinstance(val, dict):
-            object_to_multipart_dict(val, result, key)
-        elif isinstance(val, (list, tuple)):
-            for i, sub_val in enumerate(val):
-                sub_key = f"{key}[{i}]"
-                if isinstance(sub_val, dict):
-                    object_to_multipart_dict(sub_val, result, sub_key)
-                else:
-                    result[sub_key] = sub_val
-        else:
+    # Nested entries are walked with an explicit stack of item iterators, instead of
+    # recursion, which keeps the output in the same (depth-first) order as the input.
+    # Each frame is `(items, key_prefix, is_nested, is_list)`
+    stack: List[Tuple[Iterator[Tuple[Any, Any]], str, bool, bool]] = [
+        (iter(obj.items()), key_prefix, bool(existing_multipart_dict), False)
+    ]
+    while stack:
+        items, prefix, is_nested, is_list = stack[-1]
+        for _key, val in items:
+            # If this is a nested child, we need to wrap key in brackets
+            key = f"{prefix}[{_key}]" if is_nested else f"{prefix}{_key}"
+            if isinstance(val, dict):
+                # Descend into the child, and resume the current frame once it is exhausted
+                stack.append((iter(val.items()), key, True, False))
+                break
+            if isinstance(val, (list, tuple)) and not is_list:
+                stack.append((enumerate(val), key, True, True))
+                break
             result[key] = val
+        else:
+            stack.pop()
     return result
@@ -1,18 +1,25 @@
 from __future__ import annotations
 
 import csv
-import json
+import glob
+import mmap
 import os
 import pathlib
-import uuid
+import secrets
+import threading
 from dataclasses import dataclass
+from operator import itemgetter
 from pathlib import Path
 from typing import (
     Any,
     Dict,
+    Final,
+    Iterator,
     List,
     Literal,
+    NamedTuple,
     Optional,
+    Tuple,
     Union,
     cast,
 )
@@ -21,15 +28,21 @@ import pytest
 import xdist
 import xdist.dsession
 import xdist.workermanage
-from filelock import FileLock
 from typing_extensions import NotRequired, TypedDict
 
 from django_utils_lib.constants import PACKAGE_NAME, PACKAGE_NAME_SNAKE_CASE
+from django_utils_lib.json_utils import json_dumps, json_loads
 from django_utils_lib.logger import pkg_logger
 from django_utils_lib.logging_utils import build_heading_block
-from django_utils_lib.testing.utils import PytestNodeID, is_main_pytest_runner, validate_requirement_tagging
+from django_utils_lib.testing.utils import (
+    PytestNodeID,
+    is_main_pytest_runner,
+    is_xdist_distributing,
+    validate_requirement_tagging,
+)
 
 BASE_DIR = Path(__file__).resolve().parent
+_RUN_CACHE_ROOT = os.path.join(BASE_DIR, ".pytest_run_cache")
 
 
 TestStatus = Literal["PASS", "FAIL", ""]
@@ -168,16 +181,36 @@ class CollectedTestMetadata(TypedDict):
     in the format of `file_path::test_name`
     """
 
+    requirements: Optional[List[str]]
+    """
+    A list of requirements attached to the test node, passed via the `requirements()` marker
+    """
+
     doc_string: Optional[str]
     """
     The doc string attached to the given test (if applicable)
     """
 
-    requirements: Optional[List[str]]
+    status: TestStatus
+
+
+_REPORT_FIELDNAMES: Final = tuple(CollectedTestMetadata.__annotations__)
+"""
+The columns of the CSV report (in order), one per collected metadata field
+"""
+
+
+class _CollectedTestRecord(NamedTuple):
     """
-    A list of requirements attached to the test node, passed via the `requirements()` marker
+    Compact (tuple-based) form of `CollectedTestMetadata`, for holding many entries in memory
+
+    Note: Fields must be kept in the same order as `CollectedTestMetadata`, so that a record
+    doubles as a CSV report row
     """
 
+    node_id: PytestNodeID
+    requirements: Optional[List[str]]
+    doc_string: Optional[str]
     status: TestStatus
 
 
@@ -187,49 +220,180 @@ A mapping of pytest node IDs to their associated collected metadata
 """
 
 
+def _get_uncollected_test_metadata(node_id: PytestNodeID) -> CollectedTestMetadata:
+    """
+    Placeholder metadata, for tests that have results but were never collected by this plugin
+    (e.g. due to an xdist race)
+    """
+    return {"node_id": node_id, "requirements": None, "doc_string": None, "status": ""}
+
+
+def _fold_log_file(path: str, data: CollectedTestsMapping):
+    """
+    Folds the records of a collected tests JSONL log into `data` (in-place)
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        # Note: Empty files can't be memory-mapped
+        if os.fstat(fd).st_size == 0:
+            return
+        # Parse line-by-line straight out of the mapped file, rather than reading the whole
+        # log into a buffer and then splitting it into a second copy
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped_file:
+            for line in iter(mapped_file.readline, b""):
+                record = json_loads(line)
+                node_id = record["node_id"]
+                if "item" in record:
+                    data[node_id] = record["item"]
+                    continue
+                entry = data.get(node_id)
+                if entry is None:
+                    entry = data[node_id] = _get_uncollected_test_metadata(node_id)
+                entry.update(record["patch"])
+    finally:
+        os.close(fd)
+
+
 class CollectedTests:
     """
     File-backed data-store for collected test info
+
+    The backing file is an append-only JSONL log, where each line either sets the full
+    metadata for a node (`{"node_id": ..., "item": {...}}`), or patches part of it
+    (`{"node_id": ..., "patch": {...}}`). Writes are therefore O(1), and the full
+    mapping is only materialized (by folding the log) on read.
+
+    Each xdist worker writes to its own log "shard", and the main (non-shard) store folds in
+    all shards on read. Every log file therefore has exactly one writing process, so writes
+    only need an in-process lock, and never contend with other workers.
+
+    If no other processes write shards, every write goes through this instance, so reads
+    are served from an in-memory copy instead of the log.
     """
 
-    def __init__(self, run_id: str) -> None:
+    def __init__(self, run_id: str, cross_process: bool = True, shard_id: Optional[str] = None) -> None:
         """
         Args:
             run_id: This should be a global session ID, unless you want to isolate results by worker
+            cross_process: Whether other processes (e.g. xdist workers) write shards of this store.
+                If not, reads are served from memory.
+            shard_id: If set (e.g. to the xdist worker ID), writes go to a log specific to this ID
         """
-        self.tmp_dir_path = os.path.join(BASE_DIR, ".pytest_run_cache", run_id)
-        os.makedirs(self.tmp_dir_path, exist_ok=True)
+        self.tmp_dir_path = os.path.join(_RUN_CACHE_ROOT, run_id)
+        # Note: The directory is only created on first write, so that read-only
+        # (or never-used) instances don't touch the filesystem
+        self._tmp_dir_created = False
         # Due to the parallelized nature of xdist (we our library consumer might or might
-        # not be using), we are going to use a file-based system for implementing both
-        # a concurrency lock, as well as a way to easily share the metadata across
-        # processes.
-        self.temp_file_path = os.path.join(self.tmp_dir_path, "test.temp.json")
-        self.temp_file_lock_path = f"{self.temp_file_path}.lock"
-        self.file_lock = FileLock(self.temp_file_lock_path)
+        # not be using), we are going to use a file-based system for sharing the metadata
+        # across processes
+        self.shard_id = shard_id
+        self.temp_file_path = os.path.join(
+            self.tmp_dir_path, f"test.temp.{shard_id}.jsonl" if shard_id else "test.temp.jsonl"
+        )
+        # Only guards against concurrent writes from threads, since each log has a single writing process
+        self.lock = threading.RLock()
+        # Write-through cache, only kept when this instance sees every write
+        self._cache: Optional[Dict[PytestNodeID, _CollectedTestRecord]] = (
+            None if cross_process and shard_id is None else {}
+        )
+
+    def _ensure_dir(self):
+        if not self._tmp_dir_created:
+            os.makedirs(self.tmp_dir_path, exist_ok=True)
+            self._tmp_dir_created = True
+
+    def _append_lines(self, lines: bytes):
+        with self.lock:
+            self._ensure_dir()
+            with open(self.temp_file_path, "ab") as f:
+                f.write(lines)
+
+    def _append_record(self, record: Dict[str, Any]):
+        self._append_lines(json_dumps(record) + b"\n")
+
+    def _load_locked(self) -> CollectedTestsMapping:
+        """
+        Fold the log (plus, for the main store, any shards) into the full mapping
+
+        Note: Assumes the caller is holding `lock`
+        """
+        data: CollectedTestsMapping = {}
+        if self.shard_id is None:
+            # Shards are folded first, so that records from this log (e.g. statuses from
+            # reports that xdist forwards to the main process) take precedence
+            for shard_path in sorted(glob.glob(os.path.join(glob.escape(self.tmp_dir_path), "test.temp.*.jsonl"))):
+                _fold_log_file(shard_path, data)
+        _fold_log_file(self.temp_file_path, data)
+        return data
 
     def _get_data(self) -> CollectedTestsMapping:
-        with self.file_lock:
-            if not os.path.exists(self.temp_file_path):
-                return {}
-            with open(self.temp_file_path, "r") as f:
-                return json.load(f)
+        if self._cache is not None:
+            return {node_id: cast(CollectedTestMetadata, record._asdict()) for node_id, record in self._cache.items()}
+        with self.lock:
+            return self._load_locked()
+
+    def iter_report_rows(self) -> Iterator[Tuple[Any, ...]]:
+        """
+        Iterates over the collected test entries, as tuples of values in `_REPORT_FIELDNAMES` order
+        """
+        if self._cache is not None:
+            # Records are already rows
+            yield from self._cache.values()
+            return
+        yield from map(itemgetter(*_REPORT_FIELDNAMES), self._get_data().values())
 
     def __getitem__(self, node_id: PytestNodeID) -> CollectedTestMetadata:
+        if self._cache is not None:
+            return cast(CollectedTestMetadata, self._cache[node_id]._asdict())
         return self._get_data()[node_id]
 
     def __setitem__(self, node_id: str, item: CollectedTestMetadata):
-        updated_data = self._get_data()
-        updated_data[node_id] = item
-        with self.file_lock:
-            with open(self.temp_file_path, "w") as f:
-                json.dump(updated_data, f)
+        self._append_record({"node_id": node_id, "item": item})
+        if self._cache is not None:
+            self._cache[node_id] = _CollectedTestRecord(**item)
+
+    def bulk_set(self, items: CollectedTestsMapping):
+        """
+        Equivalent to setting each item individually, but with a single locked write
+        """
+        if not items:
+            return
+        self._append_lines(
+            b"".join(json_dumps({"node_id": node_id, "item": item}) + b"\n" for node_id, item in items.items())
+        )
+        if self._cache is not None:
+            self._cache.update((node_id, _CollectedTestRecord(**item)) for node_id, item in items.items())
+
+    def bulk_update_status(self, statuses: Dict[PytestNodeID, TestStatus]):
+        """
+        Equivalent to updating each test status individually, but with a single locked write
+        """
+        if not statuses:
+            return
+        self._append_lines(
+            b"".join(
+                json_dumps({"node_id": node_id, "patch": {"status": status}}) + b"\n"
+                for node_id, status in statuses.items()
+            )
+        )
+        if self._cache is not None:
+            for node_id, status in statuses.items():
+                self._set_cached_status(node_id, status)
 
     def update_test_status(self, node_id: PytestNodeID, updated_status: TestStatus):
-        updated_data = self._get_data()
-        updated_data[node_id]["status"] = updated_status
-        with self.file_lock:
-            with open(self.temp_file_path, "w") as f:
-                json.dump(updated_data, f)
+        self._append_record({"node_id": node_id, "patch": {"status": updated_status}})
+        if self._cache is not None:
+            self._set_cached_status(node_id, updated_status)
+
+    def _set_cached_status(self, node_id: PytestNodeID, status: TestStatus):
+        assert self._cache is not None
+        record = self._cache.get(node_id)
+        if record is None:
+            record = _CollectedTestRecord(**_get_uncollected_test_metadata(node_id))
+        self._cache[node_id] = record._replace(status=status)
 
 
 @pytest.hookimpl()
@@ -255,8 +419,9 @@ def pytest_sessionstart(session: pytest.Session):
         # this is the main xdist process, before nodes been distributed.
         # Regardless, we should set up a shared temporary directory, which can
         # be shared among all n{0,} nodes
-        global_session_id = uuid.uuid4().hex
-        temp_shared_session_dir_path = os.path.join(BASE_DIR, ".pytest_run_cache", global_session_id)
+        # Note: This only needs to be unique among (concurrent) runs sharing the cache dir
+        global_session_id = secrets.token_hex(8)
+        temp_shared_session_dir_path = os.path.join(_RUN_CACHE_ROOT, global_session_id)
         pathlib.Path(temp_shared_session_dir_path).mkdir(parents=True, exist_ok=True)
         session_config = cast(InternalSessionConfigDataClass, session.config)
         session_config.global_session_id = global_session_id
@@ -296,10 +461,29 @@ class CustomPytestPlugin:
 
     def __init__(self, pytest_config: pytest.Config) -> None:
         self.pytest_config = pytest_config
-        self.collected_tests = CollectedTests(self.get_internal_shared_config(pytest_config)["global_session_id"])
+        self._shared_config_cache: Dict[pytest.Config, InternalSessionConfig] = {}
         self.debugger_listening = False
+        self._auto_debug_resolved = False
+        # Test statuses are buffered, and then persisted in bulk at the end of the session
+        self._pending_statuses: Dict[PytestNodeID, TestStatus] = {}
         # We might or might not be running inside an xdist worker
         self._is_running_on_worker = not is_main_pytest_runner(pytest_config)
+        # On the main process, xdist workers (if any) write their own shards of the collected tests store
+        self.collected_tests = CollectedTests(
+            self.get_internal_shared_config(pytest_config)["global_session_id"],
+            cross_process=is_xdist_distributing(pytest_config),
+            shard_id=cast(WorkerConfigInstance, pytest_config).workerinput["workerid"]
+            if self._is_running_on_worker
+            else None,
+        )
+        # INI / env config can't change mid-session, so resolve it once, rather than on
+        # every access (some of which happen per collected item)
+        self._auto_debug = self._resolve_auto_debug()
+        self._auto_debug_wait_for_connect = bool(self.get_global_config_val("auto_debug_wait_for_connect")) or bool(
+            os.getenv(_AutoDebugWaitForConnectEnvVarConfig["name"], "")
+        )
+        self._mandate_requirement_markers = bool(self.get_global_config_val("mandate_requirement_markers"))
+        self._reporting_config = self._resolve_reporting_config()
 
     def get_global_config_val(self, config_key: PluginConfigKey):
         """
@@ -315,36 +499,30 @@ class CustomPytestPlugin:
         where to retrieve them from (for main vs worker)
         """
         config = pytest_obj if isinstance(pytest_obj, pytest.Config) else pytest_obj.config
+        # These values are fixed once the session has started, so they only need to be looked up once
+        shared_config = self._shared_config_cache.get(config)
+        if shared_config is not None:
+            return shared_config
         # If we are on the main runner, we can just directly access
         if is_main_pytest_runner(config):
             session_config = cast(InternalSessionConfigDataClass, config)
-            return {
+            shared_config = {
                 "temp_shared_session_dir_path": session_config.temp_shared_session_dir_path,
                 "global_session_id": session_config.global_session_id,
             }
-        # If we are on a worker, we can retrieve the shared config values via the `workerinput` property
-        worker_input = cast(WorkerConfigInstance, config).workerinput
-        return worker_input
+        else:
+            # If we are on a worker, we can retrieve the shared config values via the `workerinput` property
+            shared_config = cast(WorkerConfigInstance, config).workerinput
+        self._shared_config_cache[config] = shared_config
+        return shared_config
 
-    @property
-    def auto_debug(self) -> bool:
+    def _resolve_auto_debug(self) -> bool:
         # Disable if CI is detected
         if os.getenv("CI", "").lower() == "true":
             return False
         return bool(self.get_global_config_val("auto_debug")) or bool(os.getenv(_AutoDebugEnvVarConfig["name"], ""))
 
-    @property
-    def auto_debug_wait_for_connect(self) -> bool:
-        return bool(self.get_global_config_val("auto_debug_wait_for_connect")) or bool(
-            os.getenv(_AutoDebugWaitForConnectEnvVarConfig["name"], "")
-        )
-
-    @property
-    def mandate_requirement_markers(self) -> bool:
-        return bool(self.get_global_config_val("mandate_requirement_markers"))
-
-    @property
-    def reporting_config(self) -> Optional[PluginReportingConfiguration]:
+    def _resolve_reporting_config(self) -> Optional[PluginReportingConfiguration]:
         csv_export_path = os.getenv(_ReportingCSVExportPathEnvVarConfig["name"]) or self.get_global_config_val(
             "reporting__csv_export_path"
         )
@@ -355,19 +533,38 @@ class CustomPytestPlugin:
             "omit_unexecuted_tests": bool(self.get_global_config_val("reporting__omit_unexecuted_tests")),
         }
 
+    @property
+    def auto_debug(self) -> bool:
+        return self._auto_debug
+
+    @property
+    def auto_debug_wait_for_connect(self) -> bool:
+        return self._auto_debug_wait_for_connect
+
+    @property
+    def mandate_requirement_markers(self) -> bool:
+        return self._mandate_requirement_markers
+
+    @property
+    def reporting_config(self) -> Optional[PluginReportingConfiguration]:
+        return self._reporting_config
+
     @property
     def is_running_on_worker(self) -> bool:
         return self._is_running_on_worker
 
     def auto_engage_debugger(self):
-        if not self.auto_debug or self.is_running_on_worker:
+        # This is called from multiple hooks, but there is only ever a single attempt at engaging
+        # the debugger (so that, e.g., a missing `debugpy` is only reported once)
+        if self._auto_debug_resolved or not self.auto_debug or self.is_running_on_worker:
             return
+        self._auto_debug_resolved = True
         try:
             # Disable noisy warning
             os.environ["PYDEVD_DISABLE_FILE_VALIDATION"] = "1"
             import debugpy
 
-            if self.debugger_listening or debugpy.is_client_connected():
+            if debugpy.is_client_connected():
                 return
 
             DEBUGPY_PORT = int(os.environ.get("DEBUGPY_PORT_PYTEST", 5679))
@@ -399,16 +596,20 @@ class CustomPytestPlugin:
         self.auto_engage_debugger()
         # We might have multiple errors, both in a single node, as well as across all
         errors: List[str] = []
+        mandate_requirement_markers = self.mandate_requirement_markers
+        # Accumulated and then persisted with a single write, rather than one per item
+        pending: CollectedTestsMapping = {}
 
         for item in items:
             requirements: List[str] = []
-            if self.mandate_requirement_markers:
+            if mandate_requirement_markers:
                 validation_results = validate_requirement_tagging(item)
                 errors.extend(validation_results["errors"])
                 requirements = validation_results["validated_requirements"]
 
-            doc_string: str = item.obj.__doc__ or ""  # type: ignore
-            self.collected_tests[item.nodeid] = {
+            # Note: Not every item type (e.g. doctests) is backed by a Python function
+            doc_string: str = getattr(getattr(item, "function", None), "__doc__", None) or ""
+            pending[item.nodeid] = {
                 "node_id": item.nodeid,
                 "requirements": requirements,
                 "doc_string": doc_string.strip(),
@@ -418,6 +619,8 @@ class CustomPytestPlugin:
         if errors:
             raise InvalidTestConfigurationError(errors)
 
+        self.collected_tests.bulk_set(pending)
+
     @pytest.hookimpl()
     def pytest_sessionstart(self, session: pytest.Session):
         if not is_main_pytest_runner(session):
@@ -433,25 +636,40 @@ class CustomPytestPlugin:
 
     @pytest.hookimpl()
     def pytest_sessionfinish(self, session: pytest.Session, exitstatus):
-        if not self.reporting_config:
+        if self._pending_statuses:
+            self.collected_tests.bulk_update_status(self._pending_statuses)
+            self._pending_statuses = {}
+        reporting_config = self.reporting_config
+        # Note: Only the main process has the complete picture (workers only see their own shard)
+        if not reporting_config or self.is_running_on_worker:
             return
-        collected_test_mappings = self.collected_tests._get_data()
-        csv_export_path = self.reporting_config["csv_export_path"]
+        csv_export_path = reporting_config["csv_export_path"]
+        omit_unexecuted_tests = reporting_config.get("omit_unexecuted_tests", False)
         # Ensure intermediate dirs
         pathlib.Path(csv_export_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(csv_export_path, "w") as csv_file:
-            # Use keys of first entry, since all entries should have same keys
-            fieldnames = collected_test_mappings[next(iter(collected_test_mappings))].keys()
-            writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-            writer.writeheader()
-            for test in collected_test_mappings.values():
-                if self.reporting_config.get("omit_unexecuted_tests", False) and test["status"] == "":
-                    pkg_logger.warning(f"Omitting {test['node_id']} from report; no status attached (test skipped?).")
-                    continue
-                writer.writerow(test)
+        with open(csv_export_path, "w", newline="", buffering=1 << 20) as csv_file:
+            # Rows are plain tuples, rather than dicts that `DictWriter` would have to project per-row
+            node_id_column = _REPORT_FIELDNAMES.index("node_id")
+            status_column = _REPORT_FIELDNAMES.index("status")
+
+            def get_rows():
+                for row in self.collected_tests.iter_report_rows():
+                    if omit_unexecuted_tests and row[status_column] == "":
+                        pkg_logger.warning(
+                            f"Omitting {row[node_id_column]} from report; no status attached (test skipped?)."
+                        )
+                        continue
+                    yield row
+
+            writer = csv.writer(csv_file)
+            writer.writerow(_REPORT_FIELDNAMES)
+            writer.writerows(get_rows())
 
     @pytest.hookimpl
     def pytest_runtest_logreport(self, report: pytest.TestReport):
-        # Capture test outcomes and save to collection
-        if report.when == "call":
-            self.collected_tests.update_test_status(report.nodeid, "PASS" if report.passed else "FAIL")
+        # Capture test outcomes, to be saved to the collection at the end of the session.
+        # Note: xdist forwards worker reports to this hook on the main process, so statuses only
+        # need to be recorded there. Skipped (or xfailed) tests don't get a status.
+        if report.when != "call" or report.skipped or self.is_running_on_worker:
+            return
+        self._pending_statuses[report.nodeid] = "PASS" if report.passed else "FAIL"
@@ -1,21 +1,34 @@
 from __future__ import annotations
 
 import re
-from typing import Dict, List, Tuple, Union, cast
+from itertools import repeat
+from operator import lt
+from typing import Dict, List, Optional, Tuple, Union, cast
 from unittest import TestCase
+from weakref import WeakKeyDictionary
 
 import pytest
 from django.contrib.auth import authenticate
 from django.http import HttpRequest
 from django.test.client import Client as _TestClient
 from typing_extensions import TypedDict
-from xdist import is_xdist_worker
 
 PytestNodeID = str
 """
 A pytest node ID follows the format of `file_path::test_name`
 """
 
+_REQUIREMENT_PATTERN = re.compile(r"REQ-\d{3}-\d{3}")
+"""
+Pattern that (non-NA) requirement IDs must match
+"""
+
+
+_is_main_pytest_runner_by_config: WeakKeyDictionary[pytest.Config, bool] = WeakKeyDictionary()
+"""
+Cache of `is_main_pytest_runner` results, since the answer can't change for a given config
+"""
+
 
 def is_main_pytest_runner(pytest_obj: Union[pytest.Config, pytest.FixtureRequest, pytest.Session]):
     """
@@ -23,17 +36,33 @@ def is_main_pytest_runner(pytest_obj: Union[pytest.Config, pytest.FixtureRequest
 
     This should work in both xdist and non-xdist modes of operation.
     """
-    # Pytest config or worker node
-    if isinstance(pytest_obj, pytest.Config) or hasattr(pytest_obj, "workerinput"):
-        # The presence of "workerinput", on either a config or distributed node,
-        # indicates we are on a worker
-        return getattr(pytest_obj, "workerinput", None) is None
-
-    # Pytest session objects or requests
-    if hasattr(pytest_obj, "config"):
-        return is_xdist_worker(pytest_obj) is False
+    config: Optional[pytest.Config]
+    if isinstance(pytest_obj, pytest.Config):
+        config = pytest_obj
+    else:
+        # Distributed worker node (seen from the main process). The presence of
+        # "workerinput" indicates that this is a worker
+        if getattr(pytest_obj, "workerinput", None) is not None:
+            return False
+        # Objects that carry a config (sessions, requests)
+        config = getattr(pytest_obj, "config", None)
+        if config is None:
+            return False
+    is_main = _is_main_pytest_runner_by_config.get(config)
+    if is_main is None:
+        # Same as for nodes, the presence of "workerinput" on the config indicates we are on a worker
+        is_main = _is_main_pytest_runner_by_config[config] = getattr(config, "workerinput", None) is None
+    return is_main
+
+
+def is_xdist_distributing(config: pytest.Config) -> bool:
+    """
+    Utility function that returns true if xdist is distributing tests across workers
 
-    return False
+    Note: This mirrors xdist's own check, so that it covers every way of enabling distribution
+    (`-n`, as well as `--tx` with `--dist` / `-d`), rather than just `-n`
+    """
+    return config.getoption("dist", "no") != "no" and bool(config.getoption("tx", None))
 
 
 class RequirementValidationResults(TypedDict):
@@ -55,7 +84,7 @@ def validate_requirement_tagging(item: pytest.Item) -> RequirementValidationResu
             "validated_requirements": [],
         }
 
-    if not all(isinstance(arg, str) for arg in marker_args):
+    if not all(map(isinstance, marker_args, repeat(str))):
         return {
             "valid": False,
             "errors": [f"{test_name} requirements must all be strings"],
@@ -66,13 +95,11 @@ def validate_requirement_tagging(item: pytest.Item) -> RequirementValidationResu
     validated_requirements: List[str] = []
     # Verify that sort order is correct
     # E.g., req-001-001 should come before req-001-002
-    for i in range(1, len(requirements)):
-        if requirements[i] < requirements[i - 1]:
-            errors.append(f"{test_name} requirements are not sorted correctly")
-            break
+    if any(map(lt, requirements[1:], requirements)):
+        errors.append(f"{test_name} requirements are not sorted correctly")
     # Verify that it matches pattern (or is NA)
     for req in requirements:
-        if not re.match(r"REQ-\d{3}-\d{3}", req) and req != "NA":
+        if req != "NA" and not _REQUIREMENT_PATTERN.match(req):
             errors.append(f"{test_name} requirement {req} does not match pattern REQ-###-###")
         else:
             validated_requirements.append(req)
@@ -0,0 +1,46 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from django_utils_lib.auth import EmailBasedUserManager
+
+
+@pytest.mark.django_db
+def test_bulk_create_users():
+    user_model = get_user_model()
+    manager: EmailBasedUserManager = EmailBasedUserManager()
+
+    created_users = manager.bulk_create_users(
+        [
+            ("Mary.Shelley@EXAMPLE.com", "frankenstein-1818", {"username": "mary"}),
+            ("lem@example.com", "solaris-1961", {"username": "stanislaw", "is_staff": True}),
+        ],
+        max_workers=2,
+    )
+
+    # Returned instances should match the input order, with normalized emails and defaults applied
+    assert [
+        (user.email, user.username, user.is_active, user.is_staff, user.is_superuser) for user in created_users
+    ] == [
+        ("Mary.Shelley@example.com", "mary", True, False, False),
+        ("lem@example.com", "stanislaw", True, True, False),
+    ]
+    saved_users = {user.username: user for user in user_model.objects.all()}
+    assert set(saved_users) == {"mary", "stanislaw"}
+    for user, raw_password in zip(created_users, ["frankenstein-1818", "solaris-1961"]):
+        saved_user = saved_users[user.username]
+        assert saved_user.email == user.email
+        # Passwords should be stored hashed (never as-is), and be usable for logging in
+        assert saved_user.password != raw_password
+        assert saved_user.has_usable_password()
+        assert saved_user.check_password(raw_password)
+
+
+@pytest.mark.django_db
+def test_bulk_create_users_empty():
+    assert EmailBasedUserManager().bulk_create_users([]) == []
+    assert get_user_model().objects.count() == 0
+
+
+def test_bulk_create_users_requires_email():
+    with pytest.raises(ValueError, match="email must be set"):
+        EmailBasedUserManager().bulk_create_users([("", "password-123", {})])
@@ -0,0 +1,27 @@
+import pytest
+
+from django_utils_lib.logging_utils import build_heading_block
+
+
+def test_build_heading_block(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("COLUMNS", "15")
+    assert build_heading_block(["Hello", "Hi"]) == "\n".join(
+        [
+            "=" * 15,
+            "==   Hello   ==",
+            "==    Hi     ==",
+            "=" * 15,
+        ]
+    )
+
+
+@pytest.mark.parametrize("columns, border_width", [(4, 2), (80, 50)], ids=["narrow_terminal", "wide_border"])
+def test_build_heading_block_without_room(monkeypatch: pytest.MonkeyPatch, columns: int, border_width: int):
+    # Lines that don't fit should be left unpadded, rather than raising
+    monkeypatch.setenv("COLUMNS", str(columns))
+    border = "=" * border_width
+    assert build_heading_block("Hello", border_width=border_width).splitlines() == [
+        "=" * columns,
+        f"{border} Hello {border}",
+        "=" * columns,
+    ]
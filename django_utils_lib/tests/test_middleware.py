@@ -0,0 +1,36 @@
+import pytest
+from django.http import HttpResponse, HttpResponseRedirect
+from django.test import RequestFactory, override_settings
+
+from django_utils_lib.middleware import DevServerRedirectMiddleware
+
+
+@pytest.mark.parametrize(
+    "referer, original_location, expected_location",
+    [
+        # Absolute redirect, from a dev server referer
+        (
+            "http://localhost:3000/app/",
+            "http://localhost:8000/login/?next=/app/",
+            "http://localhost:3000/login/?next=/app/",
+        ),
+        # Relative redirect, from a dev server referer
+        ("http://localhost:3000/app/", "/login/", "http://localhost:3000/login/"),
+        # Referer is not a dev server, so redirect should be left alone
+        ("http://localhost:8000/app/", "/login/", "/login/"),
+    ],
+)
+def test_dev_server_redirect_middleware(
+    rf: RequestFactory, referer: str, original_location: str, expected_location: str
+):
+    with override_settings(DEV_SERVER_ACCEPTED_DEV_SERVER_PORTS=[3000]):
+        middleware = DevServerRedirectMiddleware(lambda request: HttpResponseRedirect(original_location))
+    response = middleware(rf.get("/app/", HTTP_REFERER=referer))
+    assert response["Location"] == expected_location
+
+
+def test_dev_server_redirect_middleware_passthrough(rf: RequestFactory):
+    # With no configured ports, the middleware should not touch the response
+    response = HttpResponse()
+    middleware = DevServerRedirectMiddleware(lambda request: response)
+    assert middleware(rf.get("/", HTTP_REFERER="http://localhost:3000/")) is response
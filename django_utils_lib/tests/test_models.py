@@ -0,0 +1,28 @@
+import time
+import uuid
+
+from django_utils_lib.models import uuid7
+
+
+def test_uuid7():
+    before_ms = time.time_ns() // 1_000_000
+    generated_uuid = uuid7()
+    after_ms = time.time_ns() // 1_000_000
+
+    assert generated_uuid.version == 7
+    assert generated_uuid.variant == uuid.RFC_4122
+    # The leading 48 bits are the (Unix epoch) millisecond timestamp
+    assert before_ms <= generated_uuid.int >> 80 <= after_ms
+
+
+def test_uuid7_ordering():
+    generated_uuids = []
+    for _ in range(3):
+        generated_uuids.append(uuid7())
+        # Ensure the next UUID lands in a later millisecond
+        start_ms = time.time_ns() // 1_000_000
+        while time.time_ns() // 1_000_000 == start_ms:
+            time.sleep(0.0005)
+    assert sorted(generated_uuids) == generated_uuids
+    assert sorted(map(str, generated_uuids)) == [str(generated_uuid) for generated_uuid in generated_uuids]
+    assert len({generated_uuid.int >> 80 for generated_uuid in generated_uuids}) == len(generated_uuids)
@@ -20,3 +20,19 @@ def test_object_to_multipart_dict():
     assert multipart_dict.get("nested_dict[f]") == 24.1
     assert multipart_dict.get("nested_objs_list[0][name]") == "nested obj a"
     assert multipart_dict.get("nested_objs_list[1][name]") == "nested obj b"
+
+
+def test_object_to_multipart_dict_flat():
+    flat_dict = {"a": 1, "b": "b test", "c": None}
+    assert object_to_multipart_dict(flat_dict) == flat_dict
+    assert object_to_multipart_dict(flat_dict, key_prefix="prefix_") == {
+        "prefix_a": 1,
+        "prefix_b": "b test",
+        "prefix_c": None,
+    }
+
+
+def test_object_to_multipart_dict_nested_only():
+    # Nested entries should keep their brackets, even when nothing else has been written yet
+    assert object_to_multipart_dict({"multi": [{"id": 1}]}) == {"multi[0][id]": 1}
+    assert object_to_multipart_dict({"a": {"b": 1}}) == {"a[b]": 1}
@@ -1,19 +1,72 @@
+import operator
 import re
-from typing import List, Optional, Type, TypedDict, Union, cast
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Type, Union
 from unittest import mock
 
 import pytest
 from django.contrib.auth.models import AnonymousUser
-from django.http import FileResponse, HttpResponse, HttpResponseForbidden, HttpResponseNotFound, HttpResponseRedirect
-from django.test import RequestFactory
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotFound,
+    HttpResponseRedirect,
+)
+from django.test import RequestFactory, override_settings
+from django.urls import URLResolver
+from django.urls.resolvers import RegexPattern
+
+from django_utils_lib import requests
+from django_utils_lib.lazy import lazy_django
+from django_utils_lib.requests import (
+    SimpleStaticFileServer,
+    SimpleStaticFileServerConfig,
+    _build_hyperscan_path_matcher,
+)
+
+# The server only ever reads from the user, so a single instance can be shared across requests
+ANON_USER = AnonymousUser()
+# Mocked views' return values; tests only check their types (their bodies are never read),
+# so the same instances can be shared
+_FAKE_FILE_RESPONSE = FileResponse()
+_FAKE_REDIRECT_RESPONSE = HttpResponseRedirect("")
+
+
+@pytest.fixture(scope="module")
+def rf() -> RequestFactory:
+    """
+    Module-scoped override of pytest-django's `rf`, since the factory holds no per-test state
+    """
+    return RequestFactory()
+
 
-from django_utils_lib.requests import SimpleStaticFileServer, SimpleStaticFileServerConfig
+@pytest.fixture
+def mock_serve(monkeypatch: pytest.MonkeyPatch) -> mock.MagicMock:
+    """
+    Replaces Django's static `serve` view (as used by the server), so no files are needed
+    """
+    serve_mock = mock.MagicMock(return_value=_FAKE_FILE_RESPONSE)
+    monkeypatch.setattr("django_utils_lib.requests.serve", serve_mock)
+    return serve_mock
 
 
-class StaticFileServerTestCase(TypedDict):
+@pytest.fixture
+def mock_redirect_to_login(monkeypatch: pytest.MonkeyPatch) -> mock.MagicMock:
+    """
+    Replaces the (lazily imported) `redirect_to_login` with a fresh mock for each test
+    """
+    redirect_mock = mock.MagicMock(return_value=_FAKE_REDIRECT_RESPONSE)
+    monkeypatch.setattr(lazy_django, "redirect_to_login", redirect_mock)
+    return redirect_mock
+
+
+@dataclass(frozen=True)
+class StaticFileServerTestCase:
     config: Optional[SimpleStaticFileServerConfig]
-    request_paths: List[str]
-    expected_responses: List[Union[Type[HttpResponse], Type[FileResponse]]]
+    request_paths: Tuple[str, ...]
+    expected_responses: Tuple[Union[Type[HttpResponse], Type[FileResponse]], ...]
 
 
 @pytest.mark.parametrize(
@@ -22,49 +75,91 @@ class StaticFileServerTestCase(TypedDict):
         # No custom config used - class should use defaults
         StaticFileServerTestCase(
             config=None,
-            request_paths=["/index.html", "/music/song.html", "/app/"],
-            expected_responses=[
+            request_paths=("/index.html", "/music/song.html", "/app/"),
+            expected_responses=(
                 # Default config should block bare HTML
                 HttpResponseNotFound,
                 HttpResponseNotFound,
                 # No default auth blocks
                 FileResponse,
-            ],
+            ),
         ),
         StaticFileServerTestCase(
             config=SimpleStaticFileServerConfig(
                 block_bare_html_access=False,
                 forbidden_path_patterns=[re.compile(r"/dogs/.*"), re.compile(r"^/dogs/.*")],
             ),
-            request_paths=["/dir/index.html", "/index.html", "/dir/adoption/dogs/fido.html"],
-            expected_responses=[FileResponse, FileResponse, HttpResponseForbidden],
+            request_paths=("/dir/index.html", "/index.html", "/dir/adoption/dogs/fido.html"),
+            expected_responses=(FileResponse, FileResponse, HttpResponseForbidden),
         ),
+        # No rules at all - everything should be passed through
         StaticFileServerTestCase(
-            {
-                "config": SimpleStaticFileServerConfig(
-                    block_bare_html_access=True,
-                    forbidden_path_patterns=[re.compile(r"sourcemap.js")],
-                    auth_required_path_patterns=[re.compile(r"^/app/")],
-                ),
-                "request_paths": ["/dir/index.html", "/index.html", "/hello/", "/app/"],
-                "expected_responses": [HttpResponseNotFound, HttpResponseNotFound, FileResponse, HttpResponseRedirect],
-            }
+            config=SimpleStaticFileServerConfig(block_bare_html_access=False),
+            request_paths=("/index.html", "/app/"),
+            expected_responses=(FileResponse, FileResponse),
+        ),
+        # Patterns with differing flags should still apply their own flags only
+        StaticFileServerTestCase(
+            config=SimpleStaticFileServerConfig(
+                block_bare_html_access=False,
+                forbidden_path_patterns=[re.compile(r"^/private/", re.IGNORECASE), re.compile(r"\.MAP$")],
+            ),
+            request_paths=("/PRIVATE/app.js", "/app.js.MAP", "/app.js.map", "/public/app.js"),
+            expected_responses=(HttpResponseForbidden, HttpResponseForbidden, FileResponse, FileResponse),
+        ),
+        StaticFileServerTestCase(
+            config=SimpleStaticFileServerConfig(
+                block_bare_html_access=True,
+                forbidden_path_patterns=[re.compile(r"sourcemap.js")],
+                auth_required_path_patterns=[re.compile(r"^/app/")],
+            ),
+            request_paths=("/dir/index.html", "/index.html", "/hello/", "/app/"),
+            expected_responses=(HttpResponseNotFound, HttpResponseNotFound, FileResponse, HttpResponseRedirect),
+        ),
+        # `{,n}` means `{0,n}` in Python, but is a literal in PCRE (and therefore Hyperscan)
+        StaticFileServerTestCase(
+            config=SimpleStaticFileServerConfig(
+                block_bare_html_access=False,
+                forbidden_path_patterns=[re.compile(r"^/a{,3}b"), re.compile(r"^/private/")],
+            ),
+            request_paths=("/aab", "/b", "/a{,3}b", "/private/a.js"),
+            expected_responses=(HttpResponseForbidden, HttpResponseForbidden, FileResponse, HttpResponseForbidden),
+        ),
+        # Numbered conditional groups refer to their own pattern's groups, so can't be fused with others
+        StaticFileServerTestCase(
+            config=SimpleStaticFileServerConfig(
+                block_bare_html_access=False,
+                forbidden_path_patterns=[re.compile(r"^(q)z"), re.compile(r"^/(a)?(?(1)x|y)")],
+            ),
+            request_paths=("/ax", "/ay", "/y", "/qz"),
+            expected_responses=(HttpResponseForbidden, FileResponse, HttpResponseForbidden, FileResponse),
         ),
     ],
+    ids=[
+        "defaults",
+        "forbidden_patterns",
+        "no_rules",
+        "pattern_flags",
+        "auth_required",
+        "unbounded_min_quantifier",
+        "conditional_group",
+    ],
 )
-@mock.patch(
-    "django_utils_lib.lazy.LazyDjango.redirect_to_login",
-    new_callable=mock.PropertyMock(return_value=mock.MagicMock(return_value=HttpResponseRedirect(""))),
-)
-@mock.patch("django_utils_lib.requests.serve", return_value=FileResponse())
+@pytest.mark.parametrize("use_hyperscan", [True, False], ids=["hyperscan", "re"])
 def test_path_guarding(
     mock_serve: mock.Mock,
     mock_redirect_to_login: mock.Mock,
     rf: RequestFactory,
+    monkeypatch: pytest.MonkeyPatch,
     scenario: StaticFileServerTestCase,
+    use_hyperscan: bool,
 ):
-    assert len(scenario["expected_responses"]) == len(scenario["request_paths"])
-    server = SimpleStaticFileServer(config=scenario["config"])
+    if use_hyperscan:
+        pytest.importorskip("hyperscan")
+    else:
+        monkeypatch.setattr(requests, "hyperscan", None)
+    assert len(scenario.expected_responses) == len(scenario.request_paths)
+    server = SimpleStaticFileServer(config=scenario.config)
 
     def check_response(
         response: Union[FileResponse, HttpResponse], expected_response: Union[Type[FileResponse], Type[HttpResponse]]
@@ -84,38 +179,153 @@ def test_path_guarding(
         assert mock_redirect_to_login.called is (True if issubclass(expected_response, HttpResponseRedirect) else False)
 
         mock_serve.reset_mock()
+        mock_redirect_to_login.reset_mock()
 
-    for url_path, expected_response in zip(scenario["request_paths"], scenario["expected_responses"]):
+    for url_path, expected_response in zip(scenario.request_paths, scenario.expected_responses):
         mock_request = rf.get(url_path)
-        mock_request.user = AnonymousUser()
+        mock_request.user = ANON_USER
 
         check_response(server.serve_static_path(request=mock_request, asset_path=url_path), expected_response)
 
 
+def test_guard_path_override_without_rules(mock_serve: mock.Mock, rf: RequestFactory):
+    class CustomGuardStaticFileServer(SimpleStaticFileServer):
+        def guard_path(self, request, url_path):
+            if url_path.startswith("/custom-blocked/"):
+                return HttpResponseForbidden()
+            return super().guard_path(request, url_path)
+
+    # Even without any configured rules, a subclass's `guard_path` should still be used
+    server = CustomGuardStaticFileServer(config=SimpleStaticFileServerConfig(block_bare_html_access=False))
+    for url_path, expected_response in [("/custom-blocked/a.js", HttpResponseForbidden), ("/a.js", FileResponse)]:
+        mock_request = rf.get(url_path)
+        mock_request.user = ANON_USER
+        assert isinstance(server.serve_static_path(request=mock_request, asset_path=url_path), expected_response)
+
+
+def test_path_classification_cache(mock_serve: mock.Mock, rf: RequestFactory):
+    server = SimpleStaticFileServer(
+        config=SimpleStaticFileServerConfig(forbidden_path_patterns=[re.compile(r"^/private/")])
+    )
+    for url_path, expected_response in [
+        ("/private/a.js", HttpResponseForbidden),
+        ("/public/a.js", FileResponse),
+        ("/private/a.js", HttpResponseForbidden),
+        ("/public/a.js", FileResponse),
+    ]:
+        mock_request = rf.get(url_path)
+        mock_request.user = ANON_USER
+        assert isinstance(server.serve_static_path(request=mock_request, asset_path=url_path), expected_response)
+
+    # Each distinct path should only have been classified once
+    cache_info = server._classify_path.cache_info()
+    assert (cache_info.misses, cache_info.hits) == (2, 2)
+
+    server.clear_caches()
+    assert server._classify_path.cache_info().currsize == 0
+
+
+def test_hyperscan_path_matcher():
+    pytest.importorskip("hyperscan")
+    patterns = [
+        re.compile(r"^/private/"),
+        re.compile(r"\.env$"),
+        re.compile(r"^/admin(/|$)"),
+        re.compile(r"^/v[0-9]{1,2}/(?:users|groups)/", re.ASCII),
+    ]
+    matcher = _build_hyperscan_path_matcher(patterns)
+    assert matcher is not None
+    for path in [
+        "/private/a.js",
+        "/public/a.js",
+        "/app/.env",
+        "/admin",
+        "/admin/x",
+        "/administrator",
+        "/v12/users/",
+        "",
+    ]:
+        assert matcher(path) == any(pattern.search(path) for pattern in patterns)
+
+    # Syntax that Hyperscan does not support, or would interpret differently, should fall back to `re`
+    for unsupported_pattern in [
+        re.compile(r"^/(?!public/)"),
+        re.compile(r"^/(a)\1"),
+        re.compile(r"^/a{,3}b"),
+        re.compile(r"^/a\sb"),
+        re.compile(r"^/\w+/"),
+        re.compile(r"\.env\Z"),
+        re.compile(r"^/private/", re.IGNORECASE),
+    ]:
+        assert _build_hyperscan_path_matcher([unsupported_pattern, re.compile(r"x")]) is None, unsupported_pattern
+
+
 @pytest.mark.parametrize(
-    "ignore_start_strings, expected_patterns",
+    "ignore_start_strings, request_path, expected_asset_path",
+    [
+        (None, "/app.js", "app.js"),
+        (None, "/app/", "app/index.html"),
+        (None, "/app", "app/index.html"),
+        (None, "/static/app.js", None),
+        (None, "/media/photo.png", None),
+        (["/assets/", "/files/"], "/static/app.js", "static/app.js"),
+        (["/assets/", "/files/"], "/files/", None),
+    ],
+)
+@mock.patch.object(SimpleStaticFileServer, "serve_static_path", return_value=_FAKE_FILE_RESPONSE)
+@pytest.mark.parametrize("script_name", ["", "/mount"], ids=["root", "mounted"])
+def test_generate_url_patterns(
+    mock_serve_static_path: mock.Mock,
+    rf: RequestFactory,
+    ignore_start_strings: Optional[List[str]],
+    request_path: str,
+    expected_asset_path: Optional[str],
+    script_name: str,
+):
+    server = SimpleStaticFileServer(config=None)
+    url_patterns = server.generate_url_patterns(ignore_start_strings=ignore_start_strings)
+    # Repeated calls should reuse the memoized pattern objects
+    assert all(map(operator.is_, server.generate_url_patterns(ignore_start_strings=ignore_start_strings), url_patterns))
+    resolver = URLResolver(RegexPattern(r"^/"), url_patterns)
+    match = resolver.resolve(request_path)
+    # When mounted under a prefix, that prefix is part of `request.path`, but not `request.path_info`
+    request = rf.get(request_path, SCRIPT_NAME=script_name)
+    assert request.path == f"{script_name}{request_path}"
+
+    if expected_asset_path is None:
+        with pytest.raises(Http404):
+            match.func(request, *match.args, **match.kwargs)
+        assert mock_serve_static_path.called is False
+    else:
+        match.func(request, *match.args, **match.kwargs)
+        mock_serve_static_path.assert_called_once_with(request, expected_asset_path)
+
+
+@pytest.mark.parametrize(
+    "injection_location, expected_html",
     [
         (
-            None,
-            [
-                re.compile(r"^(?!/static/)(?!/media/)(?P<asset_path>.*\..*)$"),
-                re.compile(r"^(?P<asset_path>[^?#]+).*$"),
-            ],
+            "head",
+            '<html><head><script>window.__DJANGO_CONTEXT__ = {"a":1};</script></head><body></body></html>',
         ),
         (
-            ["/assets/", "/files/"],
-            [
-                re.compile(r"^(?!/assets/)(?!/files/)(?P<asset_path>.*\..*)$"),
-                re.compile(r"^(?P<asset_path>[^?#]+).*$"),
-            ],
+            "body",
+            '<html><head></head><body><script>window.__DJANGO_CONTEXT__ = {"a":1};</script></body></html>',
         ),
     ],
+    ids=["head", "body"],
 )
-def test_generate_url_patterns(ignore_start_strings, expected_patterns):
-    server = SimpleStaticFileServer(config=None)
-    patterns = server.generate_url_patterns(ignore_start_strings=ignore_start_strings)
+def test_json_context_injection(rf: RequestFactory, tmp_path, injection_location: str, expected_html: str):
+    (tmp_path / "index.html").write_text("<html><head></head><body></body></html>")
+    server = SimpleStaticFileServer(
+        config=SimpleStaticFileServerConfig(json_context_injection_location=injection_location)
+    )
+    mock_request = rf.get("/")
+    mock_request.user = ANON_USER
 
-    assert len(patterns) == len(expected_patterns)
-    for url_pattern, expected_pattern in zip(patterns, expected_patterns):
-        re_pattern = cast(re.Pattern, url_pattern.pattern.regex)
-        assert re_pattern.pattern == expected_pattern.pattern
+    with override_settings(STATIC_ROOT=str(tmp_path)):
+        response = server.serve_static_path(
+            request=mock_request, asset_path="/index.html", url_path="/", json_data={"data": {"a": 1}}
+        )
+    assert response.content.decode() == expected_html
+    assert response["Content-Length"] == str(len(expected_html.encode()))
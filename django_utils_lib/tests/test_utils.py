@@ -1,106 +1,268 @@
+import csv
+import re
+import shutil
 import sys
-from typing import List, Optional, TypedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
 
 import pytest
 
 from django_utils_lib.cli_utils import MonkeyPatchedArgsWithExpandedRepeats
+from django_utils_lib.testing import pytest_plugin
 
 
-class RequirementValidationTestScenario(TypedDict):
+@dataclass(frozen=True)
+class RequirementValidationTestScenario:
     test_file_src: str
     expected_pass_count: int
-    expected_err_string: Optional[str]
+    expected_err_pattern: Optional[re.Pattern]
 
 
+# Patterns are compiled once, at import, rather than per scenario
+_INVALID_CONFIG_ERROR_PATTERN = re.compile(".*InvalidTestConfigurationError.*")
+
 requirement_validation_scenarios: List[RequirementValidationTestScenario] = [
     # Completely missing requirements
-    {
-        "test_file_src": """
+    RequirementValidationTestScenario(
+        test_file_src="""
     def test_missing_requirements():
         pass
     """,
-        "expected_pass_count": 0,
-        "expected_err_string": ".*InvalidTestConfigurationError:.*py::test_missing_requirements "
-        "missing `requirements`.*",
-    },
+        expected_pass_count=0,
+        expected_err_pattern=re.compile(
+            ".*InvalidTestConfigurationError:.*py::test_missing_requirements missing `requirements`.*"
+        ),
+    ),
     # Requirements included, but invalid format
-    {
-        "test_file_src": """
+    RequirementValidationTestScenario(
+        test_file_src="""
     import pytest
     @pytest.mark.requirements("Hello")
     def test_invalid_requirements():
         pass
     """,
-        "expected_pass_count": 0,
-        "expected_err_string": ".*InvalidTestConfigurationError: .*does not match pattern.*",
-    },
+        expected_pass_count=0,
+        expected_err_pattern=re.compile(".*InvalidTestConfigurationError: .*does not match pattern.*"),
+    ),
     # Requirements included, but not sorted
-    {
-        "test_file_src": """
+    RequirementValidationTestScenario(
+        test_file_src="""
     import pytest
     @pytest.mark.requirements("REQ-001-002", "REQ-001-001")
     def test_unsorted_requirements():
         pass
     """,
-        "expected_pass_count": 0,
-        "expected_err_string": ".*InvalidTestConfigurationError: .*requirements are not sorted correctly*",
-    },
+        expected_pass_count=0,
+        expected_err_pattern=re.compile(".*InvalidTestConfigurationError: .*requirements are not sorted correctly*"),
+    ),
     # Successful usage
-    {
-        "test_file_src": """
+    RequirementValidationTestScenario(
+        test_file_src="""
 import pytest
 
 @pytest.mark.requirements("REQ-004-001", "REQ-005-002")
 def test_valid_requirements():
     pass
 """,
-        "expected_pass_count": 1,
-        "expected_err_string": None,
-    },
+        expected_pass_count=1,
+        expected_err_pattern=None,
+    ),
 ]
 
 
-@pytest.mark.parametrize("scenario", requirement_validation_scenarios)
-def test_requirement_validation(scenario: RequirementValidationTestScenario, pytester: pytest.Pytester):
+@pytest.fixture(scope="session")
+def plugin_skeleton_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """
+    A directory with the (static) files shared by `pytester` environments, written once per session
+    """
+    skeleton_path = tmp_path_factory.mktemp("plugin_skeleton")
+    (skeleton_path / "conftest.py").write_text('pytest_plugins = ["django_utils_lib.testing.pytest_plugin"]\n')
+    (skeleton_path / "pytest.ini").write_text("[pytest]\nmandate_requirement_markers = True\n")
+    return skeleton_path
+
+
+@pytest.fixture
+def plugin_pytester(pytester: pytest.Pytester, plugin_skeleton_path: Path) -> pytest.Pytester:
+    """
+    A `pytester` whose test environment has our plugin registered
+    """
+    shutil.copy(plugin_skeleton_path / "conftest.py", pytester.path)
+    return pytester
+
+
+@pytest.fixture
+def requirement_validation_pytester(plugin_pytester: pytest.Pytester, plugin_skeleton_path: Path) -> pytest.Pytester:
+    """
+    A `plugin_pytester`, with requirement markers mandated
+    """
+    shutil.copy(plugin_skeleton_path / "pytest.ini", plugin_pytester.path)
+    return plugin_pytester
+
+
+@pytest.mark.parametrize(
+    "scenario", requirement_validation_scenarios, ids=["missing", "invalid_format", "unsorted", "valid"]
+)
+def test_requirement_validation(
+    scenario: RequirementValidationTestScenario, requirement_validation_pytester: pytest.Pytester
+):
     """
     Tests the requirements marker validation functionality of our pytest plugin
     """
-    # Setup a testing environment with our plugin, and mandated requirement markers
-    pytester.makeconftest("""
-pytest_plugins = ["django_utils_lib.testing.pytest_plugin"]
-""")
+    pytester = requirement_validation_pytester
+    pytester.makepyfile(test_requirements_validation=scenario.test_file_src)
+    result = pytester.runpytest_inprocess("test_requirements_validation.py")
+
+    # Search the captured output once, as a single string, with the precompiled patterns
+    output = result.stdout.str()
+    if scenario.expected_err_pattern:
+        assert scenario.expected_err_pattern.search(output), output
+    else:
+        assert _INVALID_CONFIG_ERROR_PATTERN.search(output) is None, output
+
+    result.assert_outcomes(passed=scenario.expected_pass_count)
+
+
+def test_csv_reporting(plugin_pytester: pytest.Pytester):
+    """
+    Tests the CSV report generated by our pytest plugin at the end of a session
+    """
+    pytester = plugin_pytester
     pytester.makeini("""
 [pytest]
 mandate_requirement_markers = True
+reporting__csv_export_path = reports/report.csv
+reporting__omit_unexecuted_tests = True
 """)
+    pytester.makepyfile(
+        test_reporting="""
+import pytest
 
-    pytester.makepyfile(test_requirements_validation=scenario["test_file_src"])
-    result = pytester.runpytest("test_requirements_validation.py")
+@pytest.mark.requirements("REQ-001-001")
+def test_passing():
+    \"\"\"Passes\"\"\"
+
+@pytest.mark.requirements("REQ-001-002")
+def test_failing():
+    assert False
+
+@pytest.mark.requirements("REQ-001-003")
+@pytest.mark.skip()
+def test_skipped():
+    pass
+
+@pytest.mark.requirements("REQ-001-004")
+def test_skipped_at_runtime():
+    pytest.skip()
+"""
+    )
+    result = pytester.runpytest_inprocess("test_reporting.py")
+    result.assert_outcomes(passed=1, failed=1, skipped=2)
+
+    with open(pytester.path / "reports" / "report.csv", newline="") as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert [(row["node_id"], row["status"], row["doc_string"]) for row in rows] == [
+        ("test_reporting.py::test_passing", "PASS", "Passes"),
+        ("test_reporting.py::test_failing", "FAIL", ""),
+    ]
+    assert rows[0]["requirements"] == str(["REQ-001-001"])
 
-    if scenario["expected_err_string"]:
-        result.stdout.re_match_lines([scenario["expected_err_string"]])
-    else:
-        result.stdout.no_re_match_line(".*InvalidTestConfigurationError.*")
 
-    result.assert_outcomes(passed=scenario["expected_pass_count"])
+def test_csv_reporting_without_tests(plugin_pytester: pytest.Pytester):
+    """
+    Tests that a session without any tests still produces a (header-only) CSV report
+    """
+    pytester = plugin_pytester
+    pytester.makeini("""
+[pytest]
+reporting__csv_export_path = report.csv
+""")
+    pytester.makepyfile(test_empty="")
+    pytester.runpytest_inprocess("test_empty.py")
+
+    with open(pytester.path / "report.csv", newline="") as csv_file:
+        assert list(csv.reader(csv_file)) == [["node_id", "requirements", "doc_string", "status"]]
+
+
+@pytest.mark.parametrize("cross_process", [True, False])
+def test_collected_tests_store(cross_process: bool, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests that the collected tests store folds bulk sets, single sets, and status updates
+    """
+    monkeypatch.setattr(pytest_plugin, "_RUN_CACHE_ROOT", str(tmp_path))
+    collected_tests = pytest_plugin.CollectedTests("run", cross_process=cross_process)
+    collected_tests.bulk_set(
+        {
+            node_id: {"node_id": node_id, "doc_string": "", "requirements": [], "status": ""}
+            for node_id in ["test_a.py::test_a", "test_a.py::test_b"]
+        }
+    )
+    collected_tests["test_a.py::test_c"] = {
+        "node_id": "test_a.py::test_c",
+        "doc_string": "C",
+        "requirements": ["REQ-001-001"],
+        "status": "",
+    }
+    collected_tests.update_test_status("test_a.py::test_a", "PASS")
+    collected_tests.update_test_status("test_a.py::test_c", "FAIL")
+    # Results for nodes that were never collected are still kept
+    collected_tests.update_test_status("test_a.py::test_unknown", "PASS")
+
+    assert {node_id: item["status"] for node_id, item in collected_tests._get_data().items()} == {
+        "test_a.py::test_a": "PASS",
+        "test_a.py::test_b": "",
+        "test_a.py::test_c": "FAIL",
+        "test_a.py::test_unknown": "PASS",
+    }
+    assert collected_tests["test_a.py::test_c"]["requirements"] == ["REQ-001-001"]
+    # The log on disk should hold the same data, regardless of any in-memory caching
+    assert pytest_plugin.CollectedTests("run")._get_data() == collected_tests._get_data()
+    assert list(pytest_plugin.CollectedTests("run").iter_report_rows()) == list(collected_tests.iter_report_rows())
+    # In-memory records double as report rows, so must match the report column order
+    assert pytest_plugin._CollectedTestRecord._fields == pytest_plugin._REPORT_FIELDNAMES
+
+
+def test_collected_tests_shards(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests that the main collected tests store folds in the logs of per-worker shards
+    """
+    monkeypatch.setattr(pytest_plugin, "_RUN_CACHE_ROOT", str(tmp_path))
+    main_store = pytest_plugin.CollectedTests("run")
+    items: pytest_plugin.CollectedTestsMapping = {
+        node_id: {"node_id": node_id, "doc_string": "", "requirements": [], "status": ""}
+        for node_id in ["test_a.py::test_a", "test_a.py::test_b"]
+    }
+    # Every worker collects every test, but only runs some of them
+    for worker_id, node_id in [("gw0", "test_a.py::test_a"), ("gw1", "test_a.py::test_b")]:
+        worker_store = pytest_plugin.CollectedTests("run", shard_id=worker_id)
+        worker_store.bulk_set(items)
+        worker_store.update_test_status(node_id, "PASS")
+        # Reports are forwarded to the main process, which records them in its own log
+        main_store.update_test_status(node_id, "PASS")
+
+    assert {node_id: item["status"] for node_id, item in main_store._get_data().items()} == {
+        "test_a.py::test_a": "PASS",
+        "test_a.py::test_b": "PASS",
+    }
 
 
-class MonkeyPatchedArgsWithExpandedRepeatsTestCase(TypedDict):
-    input_args: List[str]
-    args_to_expand: List[str]
-    expected_patched_args: List[str]
+@dataclass(frozen=True)
+class MonkeyPatchedArgsWithExpandedRepeatsTestCase:
+    input_args: Tuple[str, ...]
+    args_to_expand: Tuple[str, ...]
+    expected_patched_args: Tuple[str, ...]
 
 
 monkey_patched_args_with_expanded_repeats_test_cases: List[MonkeyPatchedArgsWithExpandedRepeatsTestCase] = [
     # Fairly simple example
-    {
-        "input_args": ["a", "b", "--author", "Mary Shelley", "Stanisław Lem"],
-        "args_to_expand": ["--author"],
-        "expected_patched_args": ["a", "b", "--author", "Mary Shelley", "--author", "Stanisław Lem"],
-    },
+    MonkeyPatchedArgsWithExpandedRepeatsTestCase(
+        input_args=("a", "b", "--author", "Mary Shelley", "Stanisław Lem"),
+        args_to_expand=("--author",),
+        expected_patched_args=("a", "b", "--author", "Mary Shelley", "--author", "Stanisław Lem"),
+    ),
     # More complicated, multiple items to patch, with non-patching args options between
-    {
-        "input_args": [
+    MonkeyPatchedArgsWithExpandedRepeatsTestCase(
+        input_args=(
             "a",
             "--files",
             "file_a.txt",
@@ -111,9 +273,9 @@ monkey_patched_args_with_expanded_repeats_test_cases: List[MonkeyPatchedArgsWith
             "txt",
             "md",
             "--debug",
-        ],
-        "args_to_expand": ["--files", "--parsers"],
-        "expected_patched_args": [
+        ),
+        args_to_expand=("--files", "--parsers"),
+        expected_patched_args=(
             "a",
             "--files",
             "file_a.txt",
@@ -126,17 +288,69 @@ monkey_patched_args_with_expanded_repeats_test_cases: List[MonkeyPatchedArgsWith
             "--parsers",
             "md",
             "--debug",
-        ],
-    },
+        ),
+    ),
+    # Expanded args directly following each other, or at the end without any values
+    MonkeyPatchedArgsWithExpandedRepeatsTestCase(
+        input_args=("--files", "--parsers", "txt", "--files", "a.txt", "--parsers"),
+        args_to_expand=("--files", "--parsers"),
+        expected_patched_args=("--parsers", "txt", "--files", "a.txt"),
+    ),
 ]
 
 
-@pytest.mark.parametrize("test_case", monkey_patched_args_with_expanded_repeats_test_cases)
-def test_MonkeyPatchedArgsWithExpandedRepeats(test_case: MonkeyPatchedArgsWithExpandedRepeatsTestCase):
+@pytest.mark.parametrize(
+    "test_case", monkey_patched_args_with_expanded_repeats_test_cases, ids=["simple", "multiple_args", "adjacent_args"]
+)
+def test_MonkeyPatchedArgsWithExpandedRepeats(
+    test_case: MonkeyPatchedArgsWithExpandedRepeatsTestCase, monkeypatch: pytest.MonkeyPatch
+):
     """
     Tests the `MonkeyPatchedArgsWithExpandedRepeats` context manager
     """
-    sys.argv = test_case["input_args"]
-    with MonkeyPatchedArgsWithExpandedRepeats(args_to_expand=test_case["args_to_expand"]):
-        assert sys.argv == test_case["expected_patched_args"]
-    assert sys.argv == test_case["input_args"]
+    # Patched via `monkeypatch`, so the real `sys.argv` is restored even if the test fails
+    monkeypatch.setattr(sys, "argv", list(test_case.input_args))
+    with MonkeyPatchedArgsWithExpandedRepeats(args_to_expand=list(test_case.args_to_expand)):
+        assert sys.argv == list(test_case.expected_patched_args)
+    assert sys.argv == list(test_case.input_args)
+
+
+@pytest.mark.parametrize(
+    "xdist_args",
+    [["-n", "2"], ["--tx", "2*popen", "--dist", "load"]],
+    ids=["numprocesses", "tx_with_dist"],
+)
+def test_csv_reporting_distributed(plugin_pytester: pytest.Pytester, xdist_args: List[str]):
+    """
+    Tests that the CSV report includes results from xdist workers, however distribution is enabled
+    """
+    pytester = plugin_pytester
+    pytester.makeini("""
+[pytest]
+mandate_requirement_markers = True
+reporting__csv_export_path = report.csv
+""")
+    pytester.makepyfile(
+        test_distributed="""
+import pytest
+
+@pytest.mark.requirements("REQ-001-001")
+def test_a():
+    \"\"\"Passes\"\"\"
+
+@pytest.mark.requirements("REQ-001-002")
+def test_b():
+    \"\"\"Fails\"\"\"
+    assert False
+"""
+    )
+    result = pytester.runpytest_inprocess("test_distributed.py", "-p", "xdist", *xdist_args)
+    result.assert_outcomes(passed=1, failed=1)
+
+    with open(pytester.path / "report.csv", newline="") as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    # Collected metadata only exists in the workers' shards, so this also checks those were folded in
+    assert sorted((row["node_id"], row["requirements"], row["doc_string"], row["status"]) for row in rows) == [
+        ("test_distributed.py::test_a", str(["REQ-001-001"]), "Passes", "PASS"),
+        ("test_distributed.py::test_b", str(["REQ-001-002"]), "Fails", "FAIL"),
+    ]